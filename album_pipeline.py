@@ -1,82 +1,336 @@
 import json
 import os
 import sys
+import time
+import shutil
+import argparse
+import threading
 import subprocess
 from pathlib import Path
+from artifact_store import ArtifactStore
+from disk_cache import make_key
+from progress_store import ProgressStore, PROGRESS_FILE
+from stage_scheduler import Stage, StageScheduler
+from telemetry import Telemetry, telemetry_path
+from workspace import TrackWorkspace, LYRICS_FILE, METADATA_FILE, WORKSPACES_DIR, song_filenames
+
+LYRICS_DIR = 'lyrics'
+OUTPUT_DIR = 'outputs'
+BATCH_PROGRESS_DIR = 'album_progress'
+STAGES = ('lyrics', 'song', 'video')
+DEFAULT_STAGE_WORKERS = {'lyrics': 2, 'song': 2, 'video': 1}
+
+def track_id(track):
+    return f"{track['position']}_{track['title']}"
+
+def album_slug(album_data):
+    """Filesystem-safe name of an album, used to namespace its files in batch mode"""
+    from fetch_lyrics import track_dir_name
+    return track_dir_name(f"{album_data['artist']} - {album_data['album']}")
+
+class StageClients:
+    """
+    The expensive stage dependencies: Groq key pool, Gradio client (with
+    the job manager bounding its remote jobs) and GIF index. Each is
+    created on first use and shared by every track, and in batch mode by
+    every album, of a run.
+    """
+    
+    def __init__(self):
+        self._lyrics_module = None
+        self._song_client = None
+        self._song_jobs = None
+        self._gif_source = None
+        self._init_lock = threading.Lock()
+    
+    @property
+    def lyrics_module(self):
+        with self._init_lock:
+            if self._lyrics_module is None:
+                from disk_cache import DiskCache
+                from fetch_lyrics import LyricsModule, load_api_keys
+                api_keys = load_api_keys()
+                if not api_keys:
+                    raise RuntimeError("GROQ_API_KEYS or GROQ_API_KEY not set")
+                self._lyrics_module = LyricsModule(api_keys, cache=DiskCache())
+        return self._lyrics_module
+    
+    @property
+    def song_client(self):
+        with self._init_lock:
+            if self._song_client is None:
+                from generate_song import connect_song_client
+                print("⏳ Connecting to AI music generator...")
+                self._song_client = connect_song_client()
+                print("✓ Connected to Gradio API\n")
+        return self._song_client
+    
+    @property
+    def song_jobs(self):
+        client = self.song_client
+        with self._init_lock:
+            if self._song_jobs is None:
+                from generate_song import song_job_manager
+                self._song_jobs = song_job_manager(client)
+        return self._song_jobs
+    
+    @property
+    def gif_source(self):
+        with self._init_lock:
+            if self._gif_source is None:
+                from create_video import GifSource
+                self._gif_source = GifSource()
+        return self._gif_source
+    
+    def close(self):
+        if self._gif_source is not None:
+            self._gif_source.close()
+        if self._lyrics_module is not None and self._lyrics_module.cache is not None:
+            self._lyrics_module.cache.close()
 
 class AlbumPipeline:
-    def __init__(self, album_json_path: str):
+    """
+    Generates an album track by track: lyrics, song, video.
+    
+    By default the stages run in this process and share one Groq key pool,
+    one Gradio client and one GIF index across tracks. Tracks are
+    pipelined: while one track renders, the next ones fetch lyrics and wait
+    on the song generator, each stage with its own worker count
+    (stage_workers) and a bounded queue in front of it. in_process=False
+    runs each stage as its own script, one track at a time, like the
+    standalone workflows do.
+    
+    Either way each stage's output (structured lyrics, raw song, choir
+    FLAC, video) is kept in an ArtifactStore keyed by its inputs, so a
+    retried track skips every stage that already finished.
+    """
+    
+    def __init__(self, album_json_path: str, in_process: bool = True, stage_workers: dict = None, queue_size: int = 1,
+                 progress_file: str = PROGRESS_FILE, namespace: str = '', clients: StageClients = None):
+        self.album_json_path = album_json_path
         with open(album_json_path, 'r') as f:
             self.album_data = json.load(f)
         
-        self.progress_file = 'album_progress.json'
+        self.in_process = in_process
+        self.stage_workers = dict(DEFAULT_STAGE_WORKERS, **(stage_workers or {}))
+        self.queue_size = queue_size
+        self.owns_clients = clients is None
+        self.clients = clients or StageClients()
+        self._progress_lock = threading.RLock()
+        self.stage_times = {}
+        self.artifacts = ArtifactStore()
+        
+        # Batch mode gives every album its own lyrics, workspace and output directories
+        self.namespace = namespace
+        self.lyrics_dir = os.path.join(LYRICS_DIR, namespace)
+        self.workspaces_dir = os.path.join(WORKSPACES_DIR, namespace)
+        self.output_dir = os.path.join(OUTPUT_DIR, namespace)
+        
+        self.progress_file = progress_file
         self.load_progress()
+        # Per-stage timings and resource use, one JSON line per span next to the progress file
+        self.telemetry = Telemetry(telemetry_path(progress_file), album=album_slug(self.album_data))
+    
+    @property
+    def lyrics_module(self):
+        return self.clients.lyrics_module
+    
+    @property
+    def song_client(self):
+        return self.clients.song_client
+    
+    @property
+    def song_jobs(self):
+        return self.clients.song_jobs
+    
+    @property
+    def gif_source(self):
+        return self.clients.gif_source
+    
+    def close(self):
+        if self.owns_clients:
+            self.clients.close()
     
     def load_progress(self):
-        if os.path.exists(self.progress_file):
-            with open(self.progress_file, 'r') as f:
-                self.progress = json.load(f)
-        else:
-            self.progress = {
-                'album': self.album_data['album'],
-                'artist': self.album_data['artist'],
-                'total_tracks': self.album_data['track_count'],
-                'completed_tracks': [],
-                'failed_tracks': [],
-                'current_track_index': 0,
-                'current_track': None,
-                'status': 'pending'
-            }
-            self.save_progress()
-    
-    def save_progress(self):
-        with open(self.progress_file, 'w') as f:
-            json.dump(self.progress, f, indent=2)
+        self.store = ProgressStore(self.progress_file, initial={
+            'album': self.album_data['album'],
+            'artist': self.album_data['artist'],
+            'total_tracks': self.album_data['track_count'],
+            'completed_tracks': [],
+            'failed_tracks': [],
+            'current_track_index': 0,
+            'current_track': None,
+            'status': 'pending'
+        })
+    
+    @property
+    def progress(self):
+        """The progress snapshot, in the album_progress.json layout; change it through the store"""
+        return self.store.state
     
     def get_next_track(self):
         tracks = self.album_data['tracks']
+        index = self.progress['current_track_index']
         
-        while self.progress['current_track_index'] < len(tracks):
-            track = tracks[self.progress['current_track_index']]
-            track_id = f"{track['position']}_{track['title']}"
-            
-            if track_id not in self.progress['completed_tracks'] and \
-               track_id not in self.progress['failed_tracks']:
-                self.progress['current_track'] = track
-                self.save_progress()
+        while index < len(tracks):
+            track = tracks[index]
+            if not self.store.is_done(track_id(track)):
+                self.store.update(current_track_index=index, current_track=track)
                 return track
-            
-            self.progress['current_track_index'] += 1
+            index += 1
         
+        self.store.update(current_track_index=index)
         return None
     
     def mark_completed(self, track, video_path):
-        track_id = f"{track['position']}_{track['title']}"
-        self.progress['completed_tracks'].append({
-            'track_id': track_id,
-            'title': track['title'],
-            'position': track['position'],
-            'video_path': video_path
-        })
-        self.progress['current_track_index'] += 1
-        self.save_progress()
+        with self._progress_lock:
+            self.store.mark_completed({
+                'track_id': track_id(track),
+                'title': track['title'],
+                'position': track['position'],
+                'video_path': video_path
+            })
+            self._advance_index()
     
     def mark_failed(self, track, error):
-        track_id = f"{track['position']}_{track['title']}"
-        self.progress['failed_tracks'].append({
-            'track_id': track_id,
-            'title': track['title'],
-            'position': track['position'],
-            'error': str(error)
-        })
-        self.progress['current_track_index'] += 1
-        self.save_progress()
+        with self._progress_lock:
+            self.store.mark_failed({
+                'track_id': track_id(track),
+                'title': track['title'],
+                'position': track['position'],
+                'error': str(error)
+            })
+            self._advance_index()
+    
+    def _advance_index(self):
+        """Move current_track_index past every finished track at its front; pipelined tracks may finish out of order"""
+        tracks = self.album_data['tracks']
+        index = self.progress['current_track_index']
+        while index < len(tracks) and self.store.is_done(track_id(tracks[index])):
+            index += 1
+        if index != self.progress['current_track_index']:
+            self.store.update(current_track_index=index)
     
     def is_complete(self):
         total = self.album_data['track_count']
-        processed = len(self.progress['completed_tracks']) + len(self.progress['failed_tracks'])
+        processed = len(self.store.completed) + len(self.store.failed)
         return processed >= total
     
+    def pending_tracks(self, limit):
+        """The next `limit` tracks that are neither completed nor failed"""
+        pending = []
+        for track in self.album_data['tracks'][self.progress['current_track_index']:]:
+            if not self.store.is_done(track_id(track)):
+                pending.append(track)
+            if len(pending) >= limit:
+                break
+        return pending
+    
+    def failed_tracks(self, limit):
+        """The first `limit` failed tracks, in album order"""
+        failed = [track for track in self.album_data['tracks'] if track_id(track) in self.store.failed]
+        return failed[:limit]
+    
+    def lyrics_key(self, track):
+        from fetch_lyrics import STRUCTURE_PROMPT, STRUCTURE_MODEL, STRUCTURE_TEMPERATURE
+        return make_key(track['title'], self.album_data['artist'], track.get('youtube_url') or '',
+                        STRUCTURE_PROMPT, STRUCTURE_MODEL, STRUCTURE_TEMPERATURE)
+    
+    def cached_stage(self, track, stage, key, targets, produce, keep=None):
+        """Restore a stage's files from the artifact store, or produce and store them"""
+        manifest = self.artifacts.cached(stage, key, targets, produce, keep=keep)
+        if manifest['reused']:
+            print(f"♻️  Track {track['position']}: reusing {stage} artifact {key[:12]}")
+        elif manifest.get('stored') is False:
+            print(f"⚠️  Track {track['position']}: not storing fallback {stage} output")
+        return manifest
+    
+    def cached_lyrics(self, track, workspace, fetch):
+        # Unstructured fallback lyrics serve this run but are never stored, so a later run retries Groq
+        return self.cached_stage(track, 'lyrics', self.lyrics_key(track), {
+            LYRICS_FILE: workspace.lyrics_path,
+            METADATA_FILE: workspace.metadata_path
+        }, fetch, keep=lambda: not workspace.load_metadata().get('structure_fallback', False))
+    
+    def cached_song(self, track, workspace, generate, apply_effects):
+        """
+        Raw song, then choir FLAC, each through the artifact store.
+        generate() leaves the raw song in the workspace under its original
+        name; apply_effects() writes the choir FLAC from it. Returns the
+        choir artifact's manifest.
+        """
+        from generate_song import song_request_key, choir_effects_key
+        
+        original_name, choir_name = song_filenames(track['title'])
+        with open(workspace.lyrics_path, 'r', encoding='utf-8') as f:
+            lyrics = f.read()
+        
+        raw = self.cached_stage(track, 'song', song_request_key(lyrics),
+                                {original_name: workspace.path(original_name)}, generate)
+        return self.cached_stage(track, 'choir', choir_effects_key(raw['hashes'][original_name]),
+                                 {choir_name: workspace.path(choir_name)}, apply_effects)
+    
+    def cached_video(self, track, choir, render):
+        """Video for the choir artifact through the artifact store; returns its path in outputs/"""
+        from create_video import video_filename, video_key, gif_set_digest
+        
+        name = video_filename(track['title'])
+        video_path = os.path.join(self.output_dir, name)
+        song_hash = next(iter(choir['hashes'].values()))
+        # Both render paths use VIDEO_RENDERER / RENDER_WORKERS, so the key names the renderer that runs
+        key = video_key(song_hash, track['title'], gif_set_digest())
+        self.cached_stage(track, 'video', key, {name: video_path}, render)
+        return video_path
+    
+    def prefetch_lyrics(self, tracks):
+        """Fetch and structure lyrics for all tracks of this run in one concurrent batch"""
+        tracks = [t for t in tracks if not self.artifacts.has('lyrics', self.lyrics_key(t))]
+        if not tracks:
+            return
+        
+        print(f"\n📝 Prefetching lyrics for {len(tracks)} track(s)...")
+        with self.telemetry.span('prefetch_lyrics', tracks=len(tracks)):
+            if self.in_process:
+                try:
+                    self.lyrics_module.get_lyrics_batch(tracks, self.album_data['artist'], self.lyrics_dir)
+                except Exception as e:
+                    print(f"⚠️  Batch lyrics fetch failed, tracks will fetch individually: {e}")
+                return
+            
+            result = subprocess.run([
+                'python', 'fetch_lyrics.py',
+                '--album', self.album_json_path,
+                '--positions', ','.join(str(t['position']) for t in tracks),
+                '--output-dir', self.lyrics_dir
+            ], capture_output=True, text=True, env=dict(os.environ, **self.telemetry.env()))
+        print(result.stdout)
+        if result.returncode != 0:
+            print("⚠️  Batch lyrics fetch failed, tracks will fetch individually")
+            print(f"stderr: {result.stderr}")
+    
+    def prefetched_lyrics_dir(self, track):
+        """Directory of batch-fetched lyrics for a track, or None"""
+        index_path = os.path.join(self.lyrics_dir, 'index.json')
+        if not os.path.exists(index_path):
+            return None
+        
+        with open(index_path, 'r') as f:
+            return json.load(f).get(track_id(track))
+    
+    def use_prefetched_lyrics(self, track, workspace):
+        """Copy batch-fetched lyrics into the track's workspace; False if the track has none"""
+        track_dir = self.prefetched_lyrics_dir(track)
+        if not track_dir:
+            return False
+        
+        shutil.copy(os.path.join(track_dir, LYRICS_FILE), workspace.lyrics_path)
+        shutil.copy(os.path.join(track_dir, METADATA_FILE), workspace.metadata_path)
+        return True
+    
+    def allocate_workspace(self, track):
+        from fetch_lyrics import track_dir_name
+        return TrackWorkspace.allocate(track_dir_name(track_id(track)), self.workspaces_dir)
+    
     def generate_track(self, track):
         print(f"\n{'='*60}")
         print(f"🎵 Processing Track {track['position']}/{self.album_data['track_count']}")
@@ -84,29 +338,8 @@ class AlbumPipeline:
         print(f"{'='*60}\n")
         
         try:
-            print("Step 1: Fetching lyrics...")
-            result = subprocess.run([
-                'python', 'fetch_lyrics.py',
-                track['title'],
-                self.album_data['artist'],
-                track.get('youtube_url', '')
-            ], check=True, capture_output=True, text=True)
-            print(result.stdout)
-            
-            print("\nStep 2: Generating AI song...")
-            result = subprocess.run([
-                'python', 'generate_song.py'
-            ], check=True, capture_output=True, text=True)
-            print(result.stdout)
-            
-            print("\nStep 3: Creating music video...")
-            result = subprocess.run([
-                'python', 'create_video.py'
-            ], check=True, capture_output=True, text=True)
-            print(result.stdout)
-            
-            video_filename = f"{track['title'].replace(' ', '_').lower()}_lofi_music_video.mp4"
-            video_path = os.path.join('outputs', video_filename)
+            with self.telemetry.span('track', track=track_id(track)):
+                video_path = self.run_stage_scripts(track)
             
             if os.path.exists(video_path):
                 self.mark_completed(track, video_path)
@@ -125,16 +358,200 @@ class AlbumPipeline:
             self.mark_failed(track, e)
             return False
     
+    def stage_lyrics(self, track, _):
+        """Lyrics stage: allocates the track's workspace and leaves the structured lyrics in it"""
+        from fetch_lyrics import save_lyrics
+        
+        workspace = self.allocate_workspace(track)
+        
+        def fetch():
+            if self.use_prefetched_lyrics(track, workspace):
+                print(f"✓ Using prefetched lyrics for {track['title']}")
+                return
+            
+            youtube_url = track.get('youtube_url', '')
+            lyrics = self.lyrics_module.get_lyrics(track['title'], self.album_data['artist'], youtube_url)
+            if not lyrics:
+                raise RuntimeError("Failed to fetch lyrics")
+            
+            save_lyrics(lyrics, track['title'], self.album_data['artist'], youtube_url,
+                        workspace.lyrics_path, workspace.metadata_path)
+        
+        self.cached_lyrics(track, workspace, fetch)
+        return workspace
+    
+    def stage_song(self, track, workspace):
+        """Song stage: remote generation plus choir effects, FLACs written to the workspace"""
+        from generate_song import request_song, process_choir_audio
+        
+        original_path = workspace.path(song_filenames(track['title'])[0])
+        
+        def generate():
+            with open(workspace.lyrics_path, 'r', encoding='utf-8') as f:
+                audio_path = request_song(self.song_client, f.read(), self.song_jobs,
+                                          name=f"{self.album_data['album']} #{track['position']}")
+            shutil.copy(audio_path, original_path)
+        
+        def apply_effects():
+            print("\n🎛️  Applying choir enhancements...")
+            process_choir_audio(original_path, workspace.choir_song_path(track['title']))
+        
+        choir = self.cached_song(track, workspace, generate, apply_effects)
+        return workspace, choir
+    
+    def stage_video(self, track, payload):
+        """Video stage: renders into outputs/ and removes the workspace; returns the video's path"""
+        from create_video import create_video, RENDERER, RENDER_WORKERS
+        
+        workspace, choir = payload
+        
+        def render():
+            create_video(self.gif_source, workspace.choir_song_path(track['title']), track['title'],
+                         output_dir=self.output_dir, renderer=RENDERER, workers=RENDER_WORKERS,
+                         work_dir=workspace.root)
+        
+        video_path = self.cached_video(track, choir, render)
+        if not os.path.exists(video_path):
+            raise Exception("Video file not created")
+        workspace.remove()
+        return video_path
+    
+    def run_stage(self, stage, track, payload):
+        """Run one in-process stage (stage_lyrics, stage_song, stage_video) of a track under a telemetry span"""
+        with self.telemetry.span(stage, track=track_id(track)):
+            return getattr(self, f"stage_{stage}")(track, payload)
+    
+    def record_stage(self, track, stage, state, info):
+        """StageScheduler callback: per-stage state in the progress file, completion and timings"""
+        tid = track_id(track)
+        with self._progress_lock:
+            times = self.stage_times.setdefault(tid, {})
+            if state == 'running':
+                times[stage] = time.perf_counter()
+                if stage == STAGES[0]:
+                    self.store.update(current_track=track)
+            else:
+                times[stage] = time.perf_counter() - times[stage]
+            
+            # Stage transitions only append to the event log; the snapshot is rewritten per finished track
+            self.store.set_stage(tid, stage, state)
+            
+            if state == 'failed':
+                print(f"\n❌ Track {track['position']} failed in {stage}: {info}")
+                self.mark_failed(track, info)
+            elif state == 'done' and stage == STAGES[-1]:
+                self.mark_completed(track, info)
+                print(f"\n✅ Track {track['position']} completed!")
+    
+    def begin_tracks(self, tracks):
+        """Mark every stage of the tracks about to run as pending"""
+        with self._progress_lock:
+            stages = dict(self.progress['stages'])
+            for track in tracks:
+                stages[track_id(track)] = {name: 'pending' for name in STAGES}
+            self.store.update(stages=stages)
+    
+    def run_pipelined(self, tracks):
+        """Push tracks through lyrics -> song -> video with the stages overlapping across tracks"""
+        print(f"\n🎵 Processing {len(tracks)} track(s), stage workers: "
+              + ", ".join(f"{name} {self.stage_workers[name]}" for name in STAGES))
+        
+        def stage(name):
+            return lambda track, payload: self.run_stage(name, track, payload)
+        
+        scheduler = StageScheduler(
+            [Stage(name, stage(name), self.stage_workers[name]) for name in STAGES],
+            queue_size=self.queue_size, on_event=self.record_stage
+        )
+        
+        self.begin_tracks(tracks)
+        
+        start = time.perf_counter()
+        scheduler.run(tracks)
+        wall = time.perf_counter() - start
+        
+        busy = sum(t for times in self.stage_times.values() for t in times.values())
+        print(f"\n⏱️  Wall time {wall:.1f}s for {busy:.1f}s of stage work")
+    
+    def run_stage_scripts(self, track):
+        """Run the three stage scripts as subprocesses in a fresh workspace; returns the video path"""
+        tid = track_id(track)
+        times = self.stage_times.setdefault(tid, {})
+        workspace = self.allocate_workspace(track)
+        
+        def run_script(*args):
+            # The scripts' own spans (LLM calls, predict, encode...) go to our telemetry file
+            result = subprocess.run(['python', *args, '--workspace', workspace.root],
+                                    check=True, capture_output=True, text=True,
+                                    env=dict(os.environ, **self.telemetry.env(track=tid)))
+            print(result.stdout)
+        
+        def fetch():
+            if self.use_prefetched_lyrics(track, workspace):
+                print("✓ Using prefetched lyrics")
+            else:
+                run_script('fetch_lyrics.py', track['title'], self.album_data['artist'], track.get('youtube_url', ''))
+        
+        original_path = workspace.path(song_filenames(track['title'])[0])
+        
+        def apply_effects():
+            # A fresh generation already wrote the choir FLAC; a reused raw song still needs the effects
+            if not os.path.exists(workspace.choir_song_path(track['title'])):
+                run_script('generate_song.py', '--raw-audio', original_path)
+        
+        print("Step 1: Fetching lyrics...")
+        start = time.perf_counter()
+        with self.telemetry.span('lyrics', track=tid):
+            self.cached_lyrics(track, workspace, fetch)
+        times['lyrics'] = time.perf_counter() - start
+        
+        print("\nStep 2: Generating AI song...")
+        start = time.perf_counter()
+        with self.telemetry.span('song', track=tid):
+            choir = self.cached_song(track, workspace, lambda: run_script('generate_song.py'), apply_effects)
+        times['song'] = time.perf_counter() - start
+        
+        print("\nStep 3: Creating music video...")
+        start = time.perf_counter()
+        with self.telemetry.span('video', track=tid):
+            video_path = self.cached_video(track, choir, lambda: run_script('create_video.py'))
+        times['video'] = time.perf_counter() - start
+        
+        workspace.remove()
+        return video_path
+    
+    def retry_failed(self, max_tracks_per_run=2):
+        """Re-run failed tracks; each resumes from its first stage without a stored artifact"""
+        tracks = self.failed_tracks(max_tracks_per_run)
+        if not tracks:
+            print("\n✅ No failed tracks to retry")
+            return self.is_complete()
+        
+        print(f"\n🔁 Retrying {len(tracks)} failed track(s)")
+        self.prefetch_lyrics(tracks)
+        if self.in_process:
+            self.run_pipelined(tracks)
+        else:
+            for track in tracks:
+                self.generate_track(track)
+        return self.finish_run(len(tracks))
+    
     def run(self, max_tracks_per_run=2):
-        tracks_processed = 0
+        tracks = self.pending_tracks(max_tracks_per_run)
+        self.prefetch_lyrics(tracks)
+        
+        if self.in_process:
+            if tracks:
+                self.run_pipelined(tracks)
+            return self.finish_run(len(tracks))
         
+        tracks_processed = 0
         while tracks_processed < max_tracks_per_run:
             track = self.get_next_track()
             
             if track is None:
                 print("\n✅ All tracks processed!")
-                self.progress['status'] = 'completed'
-                self.save_progress()
+                self.store.update(status='completed')
                 break
             
             success = self.generate_track(track)
@@ -142,41 +559,180 @@ class AlbumPipeline:
             
             if tracks_processed >= max_tracks_per_run and not self.is_complete():
                 print(f"\n⏸️  Processed {tracks_processed} tracks. Pausing...")
-                self.progress['status'] = 'paused'
-                self.save_progress()
+                self.store.update(status='paused')
                 return False
         
         if self.is_complete():
             print("\n🎉 Album generation complete!")
-            self.progress['status'] = 'completed'
-            self.save_progress()
+            self.store.update(status='completed')
+            return True
+        
+        return False
+    
+    def finish_run(self, tracks_processed):
+        if self.is_complete():
+            print("\n🎉 Album generation complete!")
+            self.store.update(status='completed')
             return True
         
+        if tracks_processed == 0:
+            print("\n✅ All tracks processed!")
+            self.store.update(status='completed')
+        else:
+            print(f"\n⏸️  Processed {tracks_processed} tracks. Pausing...")
+            self.store.update(status='paused')
         return False
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python album_pipeline.py <album_json_file>")
-        sys.exit(1)
+def load_album_paths(source):
+    """Album JSONs from a directory (every *.json in it) or a manifest: a JSON list of paths or one path per line"""
+    if os.path.isdir(source):
+        return sorted(str(p) for p in Path(source).glob('*.json'))
     
-    album_json = sys.argv[1]
-    max_tracks = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    base = os.path.dirname(source)
+    with open(source, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if source.endswith('.json'):
+        paths = json.loads(text)
+    else:
+        paths = [line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith('#')]
+    return [os.path.join(base, p) for p in paths]
+
+class AlbumBatch:
+    """
+    Several albums through one StageScheduler. Each album keeps its own
+    AlbumPipeline, with progress in progress_dir/<artist - album>.json and
+    its own lyrics, workspace and output directories, while the stage
+    workers and the StageClients are shared. Tracks are taken round-robin
+    across albums, so a large album cannot hold the others back.
+    """
+    
+    def __init__(self, album_paths, progress_dir: str = BATCH_PROGRESS_DIR, stage_workers: dict = None,
+                 queue_size: int = 1):
+        self.clients = StageClients()
+        self.stage_workers = dict(DEFAULT_STAGE_WORKERS, **(stage_workers or {}))
+        self.queue_size = queue_size
+        os.makedirs(progress_dir, exist_ok=True)
+        
+        self.pipelines = []
+        for path in album_paths:
+            with open(path, 'r') as f:
+                slug = album_slug(json.load(f))
+            self.pipelines.append(AlbumPipeline(
+                path, stage_workers=self.stage_workers, queue_size=queue_size,
+                progress_file=os.path.join(progress_dir, f"{slug}.json"), namespace=slug, clients=self.clients
+            ))
+    
+    def close(self):
+        self.clients.close()
+    
+    def fair_share(self, max_tracks, retry_failed=False):
+        """Up to max_tracks (pipeline, track) pairs, one pending (or failed) track per album per round"""
+        queues = [
+            [(pipeline, track) for track in (pipeline.failed_tracks(max_tracks) if retry_failed
+                                             else pipeline.pending_tracks(max_tracks))]
+            for pipeline in self.pipelines
+        ]
+        selected = []
+        while len(selected) < max_tracks and any(queues):
+            for queue in queues:
+                if queue and len(selected) < max_tracks:
+                    selected.append(queue.pop(0))
+        return selected
+    
+    def run(self, max_tracks_per_run=2, retry_failed=False):
+        """Process up to max_tracks_per_run tracks across all albums; True once every album is complete"""
+        items = self.fair_share(max_tracks_per_run, retry_failed)
+        
+        for pipeline in self.pipelines:
+            tracks = [track for owner, track in items if owner is pipeline]
+            pipeline.prefetch_lyrics(tracks)
+            pipeline.begin_tracks(tracks)
+        
+        if items:
+            print(f"\n🎵 Processing {len(items)} track(s) from {len({id(p) for p, _ in items})} album(s), "
+                  "stage workers: " + ", ".join(f"{name} {self.stage_workers[name]}" for name in STAGES))
+            
+            def stage(name):
+                return lambda item, payload: item[0].run_stage(name, item[1], payload)
+            
+            scheduler = StageScheduler(
+                [Stage(name, stage(name), self.stage_workers[name]) for name in STAGES],
+                queue_size=self.queue_size,
+                on_event=lambda item, name, state, info: item[0].record_stage(item[1], name, state, info)
+            )
+            start = time.perf_counter()
+            scheduler.run(items)
+            print(f"\n⏱️  Wall time {time.perf_counter() - start:.1f}s")
+        
+        completed = True
+        for pipeline in self.pipelines:
+            print(f"\n💿 {pipeline.album_data['artist']} - {pipeline.album_data['album']}")
+            processed = sum(1 for owner, _ in items if owner is pipeline)
+            if processed or not retry_failed:
+                completed = pipeline.finish_run(processed) and completed
+            else:
+                completed = pipeline.is_complete() and completed
+        return completed
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate an album's music videos track by track")
+    parser.add_argument('album_json', help="Album JSON from fetch_album.py; with --batch, a directory or manifest of them")
+    parser.add_argument('max_tracks', nargs='?', type=int, default=2, help="Tracks to process in this run")
+    parser.add_argument('--subprocess', action='store_true',
+                        help="Run each stage as a separate script instead of in this process")
+    for stage in STAGES:
+        parser.add_argument(f'--{stage}-workers', type=int, default=DEFAULT_STAGE_WORKERS[stage],
+                            help=f"Tracks in the {stage} stage at once")
+    parser.add_argument('--queue-size', type=int, default=1,
+                        help="Tracks allowed to wait in front of each stage")
+    parser.add_argument('--batch', action='store_true',
+                        help="Process several albums: album_json is a directory of album JSONs or a list of paths")
+    parser.add_argument('--progress-dir', default=BATCH_PROGRESS_DIR, help="Per-album progress files with --batch")
+    parser.add_argument('--retry-failed', action='store_true',
+                        help="Re-run failed tracks instead of new ones, skipping stages with stored artifacts")
+    args = parser.parse_args()
     
-    if not os.path.exists(album_json):
-        print(f"❌ Album file not found: {album_json}")
+    if not os.path.exists(args.album_json):
+        print(f"❌ Album file not found: {args.album_json}")
         sys.exit(1)
+    if args.batch and args.subprocess:
+        parser.error("--batch runs the stages in-process; drop --subprocess")
     
-    pipeline = AlbumPipeline(album_json)
-    completed = pipeline.run(max_tracks_per_run=max_tracks)
+    stage_workers = {stage: getattr(args, f'{stage}_workers') for stage in STAGES}
+    if args.batch:
+        runner = AlbumBatch(load_album_paths(args.album_json), progress_dir=args.progress_dir,
+                            stage_workers=stage_workers, queue_size=args.queue_size)
+        pipelines = runner.pipelines
+    else:
+        runner = AlbumPipeline(args.album_json, in_process=not args.subprocess,
+                               stage_workers=stage_workers, queue_size=args.queue_size)
+        pipelines = [runner]
+    try:
+        if args.batch:
+            completed = runner.run(max_tracks_per_run=args.max_tracks, retry_failed=args.retry_failed)
+        elif args.retry_failed:
+            completed = runner.retry_failed(max_tracks_per_run=args.max_tracks)
+        else:
+            completed = runner.run(max_tracks_per_run=args.max_tracks)
+    finally:
+        runner.close()
     
-    print("\n" + "="*60)
-    print(f"📊 Progress Summary")
-    print("="*60)
-    print(f"Album: {pipeline.progress['album']}")
-    print(f"Artist: {pipeline.progress['artist']}")
-    print(f"Completed: {len(pipeline.progress['completed_tracks'])}/{pipeline.progress['total_tracks']}")
-    print(f"Failed: {len(pipeline.progress['failed_tracks'])}")
-    print(f"Status: {pipeline.progress['status']}")
-    print("="*60)
+    for pipeline in pipelines:
+        print("\n" + "="*60)
+        print(f"📊 Progress Summary")
+        print("="*60)
+        print(f"Album: {pipeline.progress['album']}")
+        print(f"Artist: {pipeline.progress['artist']}")
+        print(f"Completed: {len(pipeline.progress['completed_tracks'])}/{pipeline.progress['total_tracks']}")
+        print(f"Failed: {len(pipeline.progress['failed_tracks'])}")
+        print(f"Status: {pipeline.progress['status']}")
+        print(f"Artifacts: {pipeline.artifacts.hits} reused, {pipeline.artifacts.misses} produced")
+        print(f"Telemetry: {pipeline.telemetry.path} (python telemetry.py summary {pipeline.telemetry.path})")
+        for tid, times in pipeline.stage_times.items():
+            print(f"⏱️  {tid}: " + ", ".join(f"{stage} {times[stage]:.1f}s" for stage in STAGES if stage in times))
+        print("="*60)
     
-    sys.exit(0 if completed else 2)
\ No newline at end of file
+    sys.exit(0 if completed else 2)
+
+if __name__ == "__main__":
+    main()
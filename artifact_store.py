@@ -0,0 +1,179 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+
+ARTIFACTS_DIR = os.getenv('ARTIFACTS_DIR', os.path.join('data', 'artifacts'))
+ARTIFACTS_MAX_MB = int(os.getenv('ARTIFACTS_MAX_MB', '8192'))
+MANIFEST_FILE = 'manifest.json'
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def link_or_copy(src: str, dst: str):
+    """Hard-link src at dst (replacing dst), copying only across filesystems"""
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy(src, dst)
+
+class ArtifactStore:
+    """
+    Content-addressed outputs of the pipeline stages.
+
+    An artifact is a directory <root>/<stage>/<key>/ holding the stage's
+    files and a manifest with each file's sha256. Keys are hashes of the
+    stage's inputs (see disk_cache.make_key), so a stage whose inputs are unchanged
+    finds its previous output and can be skipped. Artifacts are written to
+    a temp directory and renamed into place, so a crashed run never leaves
+    a partial one behind.
+
+    Files are hard-linked between the store and the workspace rather than
+    copied, so cached() unlinks a stage's targets before producing them:
+    a writer that truncates in place then gets a fresh file instead of
+    rewriting the stored one. Once the store grows past max_bytes the
+    least recently used artifacts (by manifest mtime) are evicted, except
+    those used by this process.
+    """
+
+    def __init__(self, root: str = ARTIFACTS_DIR, max_bytes: int = ARTIFACTS_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._pinned = set()
+        self._lock = threading.Lock()
+
+    def path(self, stage: str, key: str) -> str:
+        return os.path.join(self.root, stage, key)
+
+    def _load(self, stage: str, key: str):
+        artifact_dir = self.path(stage, key)
+        try:
+            with open(os.path.join(artifact_dir, MANIFEST_FILE), 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        manifest['files'] = {name: os.path.join(artifact_dir, name) for name in manifest['hashes']}
+        if not all(os.path.exists(path) for path in manifest['files'].values()):
+            return None
+        return manifest
+
+    def has(self, stage: str, key: str) -> bool:
+        return self._load(stage, key) is not None
+
+    def get(self, stage: str, key: str):
+        """Manifest {'files': {name: path}, 'hashes': {name: sha256}, 'meta': {...}}, or None"""
+        manifest = self._load(stage, key)
+        if manifest is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._touch(stage, key)
+        return manifest
+
+    def _touch(self, stage: str, key: str):
+        with self._lock:
+            self._pinned.add((stage, key))
+        try:
+            os.utime(os.path.join(self.path(stage, key), MANIFEST_FILE))
+        except OSError:
+            pass
+
+    def put(self, stage: str, key: str, files: dict, meta: dict = None) -> dict:
+        """Store files ({name: source path}) as the stage's artifact for key; returns its manifest"""
+        stage_dir = os.path.join(self.root, stage)
+        os.makedirs(stage_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key[:12]}-", dir=stage_dir)
+
+        try:
+            hashes = {}
+            size = 0
+            for name, src in files.items():
+                link_or_copy(src, os.path.join(tmp_dir, name))
+                hashes[name] = file_hash(src)
+                size += os.path.getsize(src)
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+                json.dump({'stage': stage, 'key': key, 'hashes': hashes, 'bytes': size, 'meta': meta or {}},
+                          f, indent=2)
+
+            try:
+                os.rename(tmp_dir, self.path(stage, key))
+            except OSError:
+                # Another worker stored the same inputs first; theirs is as good as ours
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self._touch(stage, key)
+        self._evict()
+        return self._load(stage, key)
+
+    def _evict(self):
+        with self._lock:
+            artifacts = []
+            for stage in os.listdir(self.root) if os.path.isdir(self.root) else []:
+                stage_dir = os.path.join(self.root, stage)
+                for key in os.listdir(stage_dir) if os.path.isdir(stage_dir) else []:
+                    manifest_path = os.path.join(stage_dir, key, MANIFEST_FILE)
+                    try:
+                        with open(manifest_path, 'r') as f:
+                            size = json.load(f).get('bytes', 0)
+                        artifacts.append((os.path.getmtime(manifest_path), size, stage, key))
+                    except (OSError, ValueError):
+                        continue  # a temp dir being written, or a broken artifact
+
+            total = sum(size for _, size, _, _ in artifacts)
+            for _, size, stage, key in sorted(artifacts):
+                if total <= self.max_bytes:
+                    break
+                if (stage, key) in self._pinned:
+                    continue
+                shutil.rmtree(self.path(stage, key), ignore_errors=True)
+                total -= size
+                self.evicted += 1
+
+    def restore(self, manifest: dict, targets: dict):
+        """Place the artifact's files at targets ({name: destination path})"""
+        for name, dst in targets.items():
+            link_or_copy(manifest['files'][name], dst)
+
+    def cached(self, stage: str, key: str, targets: dict, produce, meta: dict = None, keep=None) -> dict:
+        """
+        Run one stage through the store: restore its files to targets
+        ({name: path}) if an artifact for key exists, otherwise call
+        produce() to write them there and store the result, unless
+        keep() says the output is not worth keeping (e.g. a fallback).
+        Returns the artifact manifest, with 'reused' set on a hit and
+        'stored' False when the output was not kept.
+        """
+        manifest = self.get(stage, key)
+        if manifest is not None:
+            self.restore(manifest, targets)
+            manifest['reused'] = True
+            return manifest
+
+        # Break any link to a stored file before the stage writes over it
+        for path in targets.values():
+            if os.path.lexists(path):
+                os.remove(path)
+        produce()
+        if keep is not None and not keep():
+            return {'files': dict(targets), 'hashes': {name: file_hash(path) for name, path in targets.items()},
+                    'meta': meta or {}, 'reused': False, 'stored': False}
+        manifest = self.put(stage, key, targets, meta)
+        manifest['reused'] = False
+        return manifest
@@ -0,0 +1,82 @@
+"""
+Scaling of LyricsModule.detect_chorus_regex against the previous
+all-pairs window comparison, on synthetic lyric sheets.
+
+    python benchmarks/bench_chorus.py --lines 100 1000 10000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fixtures import make_lyrics
+from fetch_lyrics import LyricsModule
+
+def detect_chorus_pairwise(lyrics, min_lines=2, max_lines=6):
+    """The previous O(L * n^2) implementation, kept as a reference"""
+    lines = [l.strip() for l in lyrics.split('\n') if l.strip() and not l.strip().startswith('[')]
+    if len(lines) < min_lines:
+        return []
+
+    sequences = []
+    for seq_len in range(max_lines, min_lines - 1, -1):
+        for i in range(len(lines) - seq_len + 1):
+            sequence = tuple(lines[i:i + seq_len])
+            count = sum(1 for j in range(len(lines) - seq_len + 1)
+                        if tuple(lines[j:j + seq_len]) == sequence)
+            if count >= 2:
+                sequences.append(('\n'.join(sequence), count))
+
+    sequences.sort(key=lambda x: (x[1], len(x[0])), reverse=True)
+    seen = set()
+    unique_sequences = []
+    for seq_text, count in sequences:
+        if seq_text not in seen:
+            seen.add(seq_text)
+            unique_sequences.append((seq_text, count))
+    return unique_sequences[:3]
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, nargs='+', default=[50, 100, 200, 400, 800, 1600, 5000, 10000])
+    parser.add_argument('--pairwise-max', type=int, default=800,
+                        help="Skip the quadratic reference above this many lines")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    # detect_chorus_regex doesn't touch the Groq client
+    module = LyricsModule.__new__(LyricsModule)
+
+    results = []
+    print(f"{'lines':>7}  {'suffix array':>14}  {'pairwise':>12}")
+    for n_lines in args.lines:
+        lyrics = make_lyrics(n_lines=n_lines)
+        fast_s, fast = best_of(lambda: module.detect_chorus_regex(lyrics), args.repeat)
+
+        slow_s = None
+        if n_lines <= args.pairwise_max:
+            slow_s, slow = best_of(lambda: detect_chorus_pairwise(lyrics), 1)
+            assert fast == slow, f"results differ at {n_lines} lines"
+
+        results.append({'lines': n_lines, 'suffix_array_s': fast_s, 'pairwise_s': slow_s})
+        slow_text = f"{slow_s * 1000:10.1f}ms" if slow_s is not None else f"{'-':>12}"
+        print(f"{n_lines:7d}  {fast_s * 1000:12.2f}ms  {slow_text}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Per-track fixed overhead of the album pipeline: stage scripts run as
+subprocesses versus stage functions called in one process.
+
+The subprocess path pays, for every track, an interpreter start plus the
+imports of each stage script and a fresh GIF index/cache open (and a new
+Gradio connection, measured with --connect since it needs the network).
+The in-process path pays these once per run. Stage work itself (LLM,
+song generation, encoding) is the same on both paths and is not measured.
+
+    python benchmarks/bench_pipeline_overhead.py --tracks 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fixtures import make_gif_zip
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ['fetch_lyrics', 'generate_song', 'create_video']
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def spawn_import(module, cwd):
+    subprocess.run([sys.executable, '-c', f"import sys; sys.path.insert(0, {REPO_DIR!r}); import {module}"],
+                   cwd=cwd, check=True, capture_output=True)
+
+def open_gif_source(workdir):
+    """Time to get a ready GifSource in a fresh process, as each create_video.py run does"""
+    code = (
+        f"import sys, time; sys.path.insert(0, {REPO_DIR!r}); import create_video; "
+        f"start = time.perf_counter(); create_video.GifSource().close(); "
+        f"print(time.perf_counter() - start)"
+    )
+    env = dict(os.environ, GIF_CACHE_DIR=os.path.join(workdir, 'gif_cache'))
+    result = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env,
+                            check=True, capture_output=True, text=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+def connect_gradio():
+    sys.path.insert(0, REPO_DIR)
+    from generate_song import connect_song_client
+    connect_song_client()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tracks', type=int, default=10, help="Album size to extrapolate the run totals to")
+    parser.add_argument('--gifs', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--connect', action='store_true', help="Also time a Gradio client connection (network)")
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_pipeline_') as workdir:
+        make_gif_zip(os.path.join(workdir, 'data', 'giphy.zip'), count=args.gifs,
+                     sizes=((64, 36),), frame_range=(4, 8))
+        open_gif_source(workdir)  # build the header index once, as a real cache would have it
+
+        per_track = {}
+        for module in STAGES:
+            per_track[f'spawn+import {module}'] = best_of(lambda: spawn_import(module, workdir), args.repeat)
+        per_track['open GIF index/cache'] = min(open_gif_source(workdir) for _ in range(args.repeat))
+        if args.connect:
+            per_track['connect Gradio client'] = best_of(connect_gradio, 1)
+
+    subprocess_total = sum(per_track.values())
+    print(f"{'per-track overhead, subprocess path':40s}")
+    for name, seconds in per_track.items():
+        print(f"  {name:38s} {seconds * 1000:8.0f}ms")
+    print(f"  {'total':38s} {subprocess_total * 1000:8.0f}ms")
+    print(f"\nOver {args.tracks} tracks: subprocess {subprocess_total * args.tracks:.1f}s, "
+          f"in-process {subprocess_total:.1f}s once, saving {subprocess_total * (args.tracks - 1):.1f}s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'per_track_s': per_track, 'tracks': args.tracks}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Peak-RSS comparison of the create_video.py renderers.
+
+Runs create_video.py once per renderer in a child process on synthetic
+fixtures and reports the peak RSS of the Python process, of its largest
+ffmpeg child, and of the whole process tree (sampled from /proc, so every
+ffmpeg reader alive at once counts), plus wall time. A renderer that is
+killed or runs past --timeout is reported as such, with the peak it
+reached.
+
+    python benchmarks/bench_render_memory.py --seconds 60 120 240
+    python benchmarks/bench_render_memory.py --seconds 6 20 --gifs 8 --timeout 900
+"""
+import os
+import sys
+import json
+import argparse
+import time
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fixtures import make_render_workdir
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CREATE_VIDEO = os.path.join(REPO_DIR, 'create_video.py')
+
+CHILD = """
+import os, sys, json, time, runpy, resource
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+start = time.perf_counter()
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+finally:
+    print('BENCH ' + json.dumps({
+        'wall_s': time.perf_counter() - start,
+        'python_peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'ffmpeg_peak_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }))
+"""
+
+def tree_rss_mb(pid):
+    """Summed RSS of pid and all its descendants, from /proc (0 where /proc is unavailable)"""
+    children = {}
+    rss = {}
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+        rss[int(entry)] = int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += rss.get(current, 0)
+        stack.extend(children.get(current, []))
+    return total / (1024 * 1024)
+
+def run_renderer(workdir, renderer, timeout=None):
+    env = dict(os.environ, GIF_CACHE_DIR=os.path.join(workdir, 'gif_cache'))
+    start = time.perf_counter()
+    with open(os.path.join(workdir, f'{renderer}.log'), 'w+') as log:
+        process = subprocess.Popen([sys.executable, '-c', CHILD, CREATE_VIDEO, '--renderer', renderer],
+                                   cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT, text=True,
+                                   start_new_session=True)
+        tree_peak = 0.0
+        timed_out = False
+        while process.poll() is None:
+            tree_peak = max(tree_peak, tree_rss_mb(process.pid))
+            if timeout and time.perf_counter() - start > timeout:
+                timed_out = True
+                os.killpg(process.pid, 9)
+                process.wait()
+                break
+            time.sleep(0.2)
+        log.seek(0)
+        output = log.read()
+
+    stats = {'wall_s': time.perf_counter() - start, 'python_peak_rss_mb': None, 'ffmpeg_peak_rss_mb': None}
+    for line in output.splitlines():
+        if line.startswith('BENCH '):
+            stats.update(json.loads(line[len('BENCH '):]))
+    stats.update({'tree_peak_rss_mb': tree_peak, 'returncode': process.returncode, 'timed_out': timed_out,
+                  'ok': process.returncode == 0})
+    if not stats['ok']:
+        tail = '\n'.join(output.splitlines()[-5:])
+        print(f"  ⚠ {renderer} renderer {'timed out' if timed_out else f'exited {process.returncode}'}:\n{tail}")
+    return stats
+
+def mb(value):
+    return f"{value:8.1f} MB" if value is not None else f"{'-':>8s}   "
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, nargs='+', default=[60.0, 180.0])
+    parser.add_argument('--gifs', type=int, default=24)
+    parser.add_argument('--timeout', type=float, help="Kill a renderer still running after this many seconds")
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for seconds in args.seconds:
+        with tempfile.TemporaryDirectory(prefix='bench_render_') as workdir:
+            make_render_workdir(workdir, seconds=seconds, gif_count=args.gifs)
+            run_renderer(workdir, 'stream')  # warm the GIF cache so both runs read the same clips
+
+            for renderer in ('compose', 'stream'):
+                stats = run_renderer(workdir, renderer, args.timeout)
+                stats.update({'renderer': renderer, 'song_seconds': seconds})
+                results.append(stats)
+                status = 'ok' if stats['ok'] else 'timed out' if stats['timed_out'] else 'failed'
+                print(f"{seconds:7.0f}s  {renderer:8s}  python {mb(stats['python_peak_rss_mb'])}  "
+                      f"ffmpeg {mb(stats['ffmpeg_peak_rss_mb'])}  tree {mb(stats['tree_peak_rss_mb'])}  "
+                      f"wall {stats['wall_s']:7.1f}s  {status}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
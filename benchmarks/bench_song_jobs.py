@@ -0,0 +1,113 @@
+"""
+Remote song generation for an album: one blocking predict() per track
+versus song_jobs.SongJobManager keeping several jobs in the Space's queue,
+against a local fake Space (no network) that runs `capacity` jobs at once,
+each taking --seconds, and fails every --fail-every'th submission.
+
+    python benchmarks/bench_song_jobs.py --tracks 8 --seconds 0.5 --capacity 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from song_jobs import SongJobManager
+
+class FakeJob:
+    """The parts of gradio_client.Job the manager uses, driven by the fake Space's clock"""
+
+    def __init__(self, space, lyric, finish_at, fail):
+        self.space = space
+        self.lyric = lyric
+        self.finish_at = finish_at
+        self.fail = fail
+        self.cancelled = False
+
+    def done(self):
+        return self.cancelled or time.monotonic() >= self.finish_at
+
+    def result(self, timeout=None):
+        while not self.done():
+            time.sleep(0.005)
+        if self.fail:
+            raise RuntimeError("fake Space error")
+        return [f"/tmp/{abs(hash(self.lyric))}.flac", {'inference_duration': self.space.seconds}]
+
+    def status(self):
+        ahead = sum(1 for start in self.space.starts if start > time.monotonic())
+        return SimpleNamespace(code=SimpleNamespace(name='IN_QUEUE' if ahead else 'PROCESSING'),
+                               rank=ahead or None, queue_size=len(self.space.starts), eta=None)
+
+    def cancel(self):
+        self.cancelled = True
+        return True
+
+class FakeSongSpace:
+    """Runs `capacity` jobs at a time, each taking `seconds`; submissions queue FIFO"""
+
+    def __init__(self, seconds, capacity=1, fail_every=0):
+        self.seconds = seconds
+        self.capacity = capacity
+        self.fail_every = fail_every
+        self.free_at = [0.0] * capacity
+        self.starts = []
+        self.submissions = 0
+        self._lock = threading.Lock()
+
+    def submit(self, lyric, **kwargs):
+        with self._lock:
+            self.submissions += 1
+            now = time.monotonic()
+            slot = min(range(self.capacity), key=lambda i: self.free_at[i])
+            start = max(now, self.free_at[slot])
+            self.free_at[slot] = start + self.seconds
+            self.starts.append(start)
+            fail = bool(self.fail_every) and self.submissions % self.fail_every == 0
+            return FakeJob(self, lyric, start + self.seconds, fail)
+
+    def predict(self, lyric, **kwargs):
+        job = self.submit(lyric, **kwargs)
+        return job.result()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tracks', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=0.5, help="Fake generation time per song")
+    parser.add_argument('--capacity', type=int, default=4, help="Jobs the fake Space runs at once")
+    parser.add_argument('--max-active', type=int, default=4)
+    parser.add_argument('--fail-every', type=int, default=5, help="Fail every Nth submission (0: never)")
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    lyrics = {f"track {i + 1}": f"[verse]\nline {i}" for i in range(args.tracks)}
+
+    space = FakeSongSpace(args.seconds, args.capacity)
+    start = time.perf_counter()
+    for text in lyrics.values():
+        space.predict(lyric=text)
+    serial = time.perf_counter() - start
+
+    space = FakeSongSpace(args.seconds, args.capacity, args.fail_every)
+    manager = SongJobManager(space, max_active=args.max_active, timeout=args.seconds * args.tracks * 4,
+                             retries=2, backoff=0.05, poll_seconds=0.02)
+    start = time.perf_counter()
+    results = manager.run(lyrics)
+    managed = time.perf_counter() - start
+
+    failed = [name for name, result in results.items() if isinstance(result, Exception)]
+    print(f"\n{args.tracks} songs at {args.seconds:.2f}s, Space capacity {args.capacity}")
+    print(f"  serial predict()   {serial:7.2f}s")
+    print(f"  job manager x{args.max_active:<4d} {managed:7.2f}s  ({serial / managed:4.1f}x), "
+          f"{manager.submitted} submissions, {manager.retried} retries, {len(failed)} failed")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'tracks': args.tracks, 'seconds': {'serial': serial, 'managed': managed},
+                       'submissions': manager.submitted, 'retries': manager.retried, 'failed': failed}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Startup cost of the stage scripts: what `import <script>` and
+`python <script>.py --help` cost in a fresh interpreter, and whether either
+leaves anything on disk.
+
+Each import runs under `python -X importtime` in an empty directory; the
+report gives the script's cumulative import time and its heaviest direct
+imports, so a heavy dependency creeping back to module level shows up by
+name. Imports should take milliseconds and create no files.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --scripts create_video generate_song --top 10 --json startup.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = ['fetch_album', 'fetch_lyrics', 'generate_song', 'create_video', 'merge_videos', 'album_pipeline']
+
+def parse_importtime(stderr):
+    """[(name, depth, self_us, cumulative_us)] from -X importtime output, in the order imports finished"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        stripped = name.lstrip()
+        depth = (len(name) - len(stripped) - 1) // 2
+        entries.append((stripped, depth, int(self_us), int(cumulative_us)))
+    return entries
+
+def direct_imports(entries, module):
+    """(cumulative_us of module, [(name, cumulative_us)] of its direct imports, heaviest first)"""
+    for i, (name, depth, _, cumulative) in enumerate(entries):
+        if name == module and depth == 0:
+            children = []
+            # Post-order: the module's children precede it, back to the previous top-level entry
+            for child, child_depth, _, child_cumulative in reversed(entries[:i]):
+                if child_depth == 0:
+                    break
+                if child_depth == 1:
+                    children.append((child, child_cumulative))
+            return cumulative, sorted(children, key=lambda c: -c[1])
+    return None, []
+
+def files_under(root):
+    return sorted(os.path.relpath(os.path.join(d, f), root) for d, _, files in os.walk(root) for f in files)
+
+def run_fresh(args, repeat):
+    """Best wall time, last result and created files of a command run in a fresh empty directory"""
+    best, result, created = None, None, []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix='bench_startup_') as workdir:
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, *args], cwd=workdir, capture_output=True, text=True,
+                                    env=dict(os.environ, PYTHONPATH=REPO_DIR, PYTHONDONTWRITEBYTECODE='1'))
+            wall = time.perf_counter() - start
+            created = files_under(workdir)
+        best = wall if best is None else min(best, wall)
+    return best, result, created
+
+def measure(script, repeat, top):
+    import_wall, imported, import_files = run_fresh(['-X', 'importtime', '-c', f'import {script}'], repeat)
+    help_wall, helped, help_files = run_fresh([os.path.join(REPO_DIR, f'{script}.py'), '--help'], repeat)
+
+    if imported.returncode != 0:
+        error = imported.stderr.strip().splitlines()[-1]
+        return {'error': error, 'help_s': help_wall, 'help_ok': helped.returncode == 0}
+
+    cumulative, children = direct_imports(parse_importtime(imported.stderr), script)
+    return {
+        'import_s': import_wall,
+        'import_cumulative_ms': (cumulative or 0) / 1000,
+        'heaviest_imports_ms': {name: us / 1000 for name, us in children[:top]},
+        'help_s': help_wall,
+        'help_ok': helped.returncode == 0,
+        'files_created': sorted(set(import_files) | set(help_files)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scripts', nargs='+', choices=SCRIPTS, default=SCRIPTS)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the fastest is kept")
+    parser.add_argument('--top', type=int, default=5, help="Heaviest direct imports listed per script")
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'script':16s} {'import':>9s} {'cumulative':>11s} {'--help':>9s}  heaviest imports")
+    for script in args.scripts:
+        stats = results[script] = measure(script, args.repeat, args.top)
+        if 'error' in stats:
+            print(f"{script:16s} ❌ import failed: {stats['error']}")
+            continue
+        heaviest = ', '.join(f"{name} {ms:.0f}ms" for name, ms in stats['heaviest_imports_ms'].items())
+        print(f"{script:16s} {stats['import_s'] * 1000:7.0f}ms {stats['import_cumulative_ms']:9.1f}ms "
+              f"{stats['help_s'] * 1000:7.0f}ms  {heaviest}")
+        if not stats['help_ok']:
+            print(f"{'':16s} ⚠️  --help exited non-zero")
+        if stats['files_created']:
+            print(f"{'':16s} ⚠️  created {', '.join(stats['files_created'])}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
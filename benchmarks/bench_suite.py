@@ -0,0 +1,244 @@
+"""
+Offline benchmark suite over every pipeline stage, for catching
+regressions from code changes or dependency upgrades (moviepy, scipy...).
+
+Builds synthetic fixtures (a zip of GIFs of varying size and frame rate,
+a FLAC, a lyric sheet with repeats, small track videos) and runs each case
+in its own child process, recording wall time, CPU time and peak RSS of
+the process and of its ffmpeg children. Nothing touches the network: the
+cases call the stage functions directly, with no Groq or Gradio client.
+
+    python benchmarks/bench_suite.py --json results.json
+    python benchmarks/bench_suite.py --baseline results.json --tolerance 0.15
+    python benchmarks/bench_suite.py --cases dsp chorus --song-seconds 300
+"""
+import os
+import sys
+import json
+import time
+import zipfile
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fixtures import make_render_workdir, make_lyrics, make_track_videos, make_progress_file
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TITLE = 'Bench Song'
+SONG_FILE = 'bench_song_ai_cover_slowed.flac'
+METRICS = ('wall_s', 'cpu_s', 'peak_rss_mb', 'children_peak_rss_mb')
+PACKAGES = ('moviepy', 'numpy', 'scipy', 'soundfile', 'pydub', 'Pillow', 'imageio', 'imageio-ffmpeg')
+
+# Each case: setup(workdir, params) -> state, outside the timed region; run(state) is timed
+
+def setup_gif_load(workdir, params):
+    from create_video import load_and_process_gif
+    extract_dir = os.path.join(workdir, 'gifs_extracted')
+    with zipfile.ZipFile(os.path.join(workdir, 'data', 'giphy.zip')) as zip_ref:
+        zip_ref.extractall(extract_dir)
+    return load_and_process_gif, sorted(os.path.join(extract_dir, g) for g in os.listdir(extract_dir))
+
+def run_gif_load(state):
+    load_and_process_gif, paths = state
+    for path in paths:
+        clip = load_and_process_gif(path)
+        if clip is not None:
+            clip.get_frame(0)
+            clip.close()
+
+def setup_gif_playlist(workdir, params):
+    from create_video import GifSource, get_random_clips_no_repeat
+    source = GifSource(use_cache=False, extract_dir=os.path.join(workdir, 'gifs_playlist'))
+    return get_random_clips_no_repeat, source, params['song_seconds']
+
+def run_gif_playlist(state):
+    get_random_clips_no_repeat, source, seconds = state
+    for clip in get_random_clips_no_repeat(source, seconds):
+        clip.close()
+
+def setup_render(workdir, params):
+    from create_video import GifSource, create_video
+    source = GifSource()
+    for gif_file in source.gif_files:
+        source.cache.get(gif_file)  # time the render, not the one-off normalization
+    return create_video, source, workdir, params['workers']
+
+def run_render(state):
+    create_video, source, workdir, workers = state
+    create_video(source, os.path.join(workdir, SONG_FILE), TITLE, output_dir=os.path.join(workdir, 'outputs'),
+                 workers=workers, work_dir=workdir)
+
+def setup_dsp(workdir, params, streaming=False):
+    from generate_song import process_choir_audio
+    return process_choir_audio, os.path.join(workdir, SONG_FILE), os.path.join(workdir, 'dsp_out.flac'), streaming
+
+def run_dsp(state):
+    process_choir_audio, in_path, out_path, streaming = state
+    process_choir_audio(in_path, out_path, streaming=streaming)
+
+def setup_lyrics(workdir, params):
+    from fetch_lyrics import LyricsModule
+    # The text helpers don't touch the Groq client
+    return LyricsModule.__new__(LyricsModule), make_lyrics(n_lines=params['lyrics_lines'])
+
+def run_chorus(state):
+    module, lyrics = state
+    module.detect_chorus_regex(lyrics)
+
+def run_clean_lyrics(state):
+    module, lyrics = state
+    module.clean_lyrics(lyrics)
+
+def setup_merge(workdir, params):
+    from merge_videos import merge_album_videos
+    videos = make_track_videos(os.path.join(workdir, 'tracks'), count=params['merge_tracks'])
+    progress = make_progress_file(os.path.join(workdir, 'bench_progress.json'), videos)
+    return merge_album_videos, progress, os.path.join(workdir, 'merged')
+
+def run_merge(state):
+    merge_album_videos, progress, output_dir = state
+    os.makedirs(output_dir, exist_ok=True)
+    merge_album_videos(progress, output_dir, mode='copy')
+
+CASES = {
+    'gif_load': (setup_gif_load, run_gif_load),
+    'gif_playlist': (setup_gif_playlist, run_gif_playlist),
+    'render': (setup_render, run_render),
+    'dsp': (setup_dsp, run_dsp),
+    'dsp_streaming': (lambda workdir, params: setup_dsp(workdir, params, streaming=True), run_dsp),
+    'chorus': (setup_lyrics, run_chorus),
+    'clean_lyrics': (setup_lyrics, run_clean_lyrics),
+    'merge': (setup_merge, run_merge),
+}
+
+def child_main(case, workdir, params):
+    """Run one case in this (fresh) process and print its measurements"""
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(workdir)
+    setup, run = CASES[case]
+    state = setup(workdir, params)
+
+    # Keep the stages' progress output out of the way of the BENCH line
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        cpu = time.process_time()
+        start = time.perf_counter()
+        run(state)
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print('BENCH ' + json.dumps({
+        'wall_s': wall,
+        'cpu_s': cpu,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'children_peak_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }))
+
+def run_case(case, workdir, params):
+    env = dict(os.environ, GIF_CACHE_DIR=os.path.join(workdir, 'gif_cache'),
+               PIPELINE_CACHE_PATH=os.path.join(workdir, 'pipeline_cache.sqlite'))
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', case, workdir, json.dumps(params)],
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith('BENCH '):
+            return json.loads(line[len('BENCH '):])
+    raise RuntimeError(f"{case} failed:\n{result.stdout}\n{result.stderr}")
+
+def environment():
+    from importlib import metadata
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            pass
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'packages': versions}
+
+def compare(results, baseline, tolerance):
+    """Print current vs baseline per case and metric; returns the regressions beyond tolerance"""
+    regressions = []
+    print(f"\n{'case':16s} {'metric':22s} {'baseline':>10s} {'current':>10s} {'ratio':>7s}")
+    for case, stats in results.items():
+        before = baseline.get('cases', {}).get(case)
+        if before is None:
+            print(f"{case:16s} (not in baseline)")
+            continue
+        for metric in METRICS:
+            old, new = before.get(metric), stats.get(metric)
+            if not old or new is None:
+                continue
+            ratio = new / old
+            flag = ''
+            if ratio > 1 + tolerance:
+                flag = '  ⚠️  slower' if metric.endswith('_s') else '  ⚠️  more memory'
+                regressions.append((case, metric, ratio))
+            print(f"{case:16s} {metric:22s} {old:10.3f} {new:10.3f} {ratio:6.2f}x{flag}")
+    return regressions
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child_main(sys.argv[2], sys.argv[3], json.loads(sys.argv[4]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--gifs', type=int, default=24, help="GIFs in the synthetic collection")
+    parser.add_argument('--song-seconds', type=float, default=60.0, help="Length of the synthetic FLAC")
+    parser.add_argument('--lyrics-lines', type=int, default=2000, help="Length of the synthetic lyric sheet")
+    parser.add_argument('--merge-tracks', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=1, help="Render workers for the render case")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per case; the fastest run is kept")
+    parser.add_argument('--json', help="Write results to this file (usable as a later --baseline)")
+    parser.add_argument('--baseline', help="Results JSON from an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="Relative slowdown or memory growth counted as a regression")
+    args = parser.parse_args()
+
+    params = {
+        'song_seconds': args.song_seconds,
+        'lyrics_lines': args.lyrics_lines,
+        'merge_tracks': args.merge_tracks,
+        'workers': args.workers,
+    }
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='bench_suite_') as workdir:
+        make_render_workdir(workdir, title=TITLE, seconds=args.song_seconds, gif_count=args.gifs)
+
+        print(f"{'case':16s} {'wall':>9s} {'cpu':>9s} {'peak RSS':>10s} {'children':>10s}")
+        for case in args.cases:
+            runs = [run_case(case, workdir, params) for _ in range(args.repeat)]
+            stats = min(runs, key=lambda r: r['wall_s'])
+            stats['peak_rss_mb'] = max(r['peak_rss_mb'] for r in runs)
+            stats['children_peak_rss_mb'] = max(r['children_peak_rss_mb'] for r in runs)
+            results[case] = stats
+            print(f"{case:16s} {stats['wall_s']:8.3f}s {stats['cpu_s']:8.3f}s "
+                  f"{stats['peak_rss_mb']:7.1f} MB {stats['children_peak_rss_mb']:7.1f} MB")
+
+    report = {'params': dict(params, gifs=args.gifs), 'environment': environment(), 'cases': results}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('params') != report['params']:
+            print("\n⚠️  Baseline was recorded with different fixture parameters")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+YouTube URL lookup for an album: the previous one-YoutubeDL-per-track
+serial loop versus fetch_album.YoutubeResolver, against a local stub
+extractor that sleeps for a fixed search latency (no network).
+
+    python benchmarks/bench_youtube_resolver.py --tracks 20 --latency 0.5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fetch_album import YoutubeResolver, get_youtube_urls
+
+class StubYoutubeDL:
+    """extract_info like a flat ytsearch1 lookup, after `latency` seconds"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=False):
+        time.sleep(self.latency)
+        query = url.split(':', 1)[1]
+        return {'entries': [{'id': str(abs(hash(query)) % 10**11), 'title': query}]}
+
+def serial_lookup(queries, latency):
+    """The previous loop: a fresh extractor and a blocking search per track"""
+    results = []
+    for query in queries:
+        with StubYoutubeDL(latency) as ydl:
+            results.append(ydl.extract_info(f"ytsearch1:{query}")['entries'][0])
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tracks', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds per stub search")
+    parser.add_argument('--workers', type=int, nargs='+', default=[4, 8, 20])
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    album = {
+        'track_count': args.tracks,
+        'tracks': [{'position': str(i + 1), 'title': f"Track {i + 1}", 'length': '0'} for i in range(args.tracks)]
+    }
+    queries = [f"Artist {t['title']}" for t in album['tracks']]
+
+    start = time.perf_counter()
+    expected = serial_lookup(queries, args.latency)
+    results = {'serial': time.perf_counter() - start}
+
+    for workers in args.workers:
+        resolver = YoutubeResolver(workers=workers, ydl_factory=lambda: StubYoutubeDL(args.latency))
+        start = time.perf_counter()
+        found = get_youtube_urls('Artist', dict(album), resolver=resolver)
+        results[f'resolver x{workers}'] = time.perf_counter() - start
+        resolver.close()
+        assert [t['youtube_id'] for t in found['tracks']] == [e['id'] for e in expected], "results out of order"
+
+    print(f"{args.tracks} tracks, {args.latency:.2f}s per search")
+    for name, seconds in results.items():
+        print(f"  {name:16s} {seconds:7.2f}s  ({results['serial'] / seconds:4.1f}x)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'tracks': args.tracks, 'latency_s': args.latency, 'seconds': results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
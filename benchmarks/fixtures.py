@@ -0,0 +1,99 @@
+"""Synthetic, offline fixtures for the benchmarks"""
+import os
+import io
+import json
+import zipfile
+import numpy as np
+
+def make_gif_zip(zip_path, count=12, seed=0,
+                 sizes=((480, 270), (320, 320), (270, 480)),
+                 frame_range=(8, 24), fps_choices=(10, 15, 25)):
+    """Write a zip of animated GIFs of varying size, length and frame rate"""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.dirname(zip_path) or '.', exist_ok=True)
+
+    with zipfile.ZipFile(zip_path, 'w') as zip_ref:
+        for i in range(count):
+            width, height = sizes[i % len(sizes)]
+            n_frames = int(rng.integers(*frame_range))
+            delay_ms = int(1000 / fps_choices[i % len(fps_choices)])
+
+            base = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+            frames = [
+                Image.fromarray(np.roll(base, shift=k * 4, axis=1))
+                for k in range(n_frames)
+            ]
+
+            buf = io.BytesIO()
+            frames[0].save(buf, format='GIF', save_all=True,
+                           append_images=frames[1:], duration=delay_ms, loop=0)
+            zip_ref.writestr(f'gif_{i:04d}.gif', buf.getvalue())
+
+    return zip_path
+
+def make_flac(flac_path, seconds=60.0, sample_rate=44100, channels=2, seed=0):
+    """Write a FLAC with a few sine partials plus noise"""
+    import soundfile as sf
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    mono = sum(0.2 * np.sin(2 * np.pi * f * t) for f in (220.0, 330.0, 440.0, 5500.0, 12000.0))
+    audio = np.stack([mono] * channels, axis=1)
+    audio += 0.02 * rng.standard_normal(audio.shape)
+    sf.write(flac_path, (audio * 0.5).astype(np.float32), sample_rate, subtype='PCM_16')
+    return flac_path
+
+def make_lyrics(n_lines=60, chorus_lines=4, chorus_every=12, seed=0):
+    """Lyric sheet with a chorus block repeated every chorus_every lines"""
+    rng = np.random.default_rng(seed)
+    words = ['love', 'night', 'light', 'heart', 'fire', 'rain', 'home', 'road', 'sky', 'dream']
+    chorus = [f"oh {' '.join(rng.choice(words, 4))}" for _ in range(chorus_lines)]
+
+    lines = []
+    verse_line = 0
+    while len(lines) < n_lines:
+        if lines and len(lines) % chorus_every == 0:
+            lines.extend(chorus)
+        else:
+            lines.append(f"{verse_line} {' '.join(rng.choice(words, 5))}")
+            verse_line += 1
+    return '\n'.join(lines[:n_lines])
+
+def make_render_workdir(root, title='Bench Song', seconds=60.0, gif_count=12):
+    """Lay out the files create_video.py expects in a fresh working directory"""
+    os.makedirs(root, exist_ok=True)
+    make_gif_zip(os.path.join(root, 'data', 'giphy.zip'), count=gif_count)
+    make_flac(os.path.join(root, f"{title.replace(' ', '_').lower()}_ai_cover_slowed.flac"), seconds=seconds)
+    with open(os.path.join(root, 'lyrics_metadata.json'), 'w') as f:
+        json.dump({'title': title, 'artist': 'Bench Artist'}, f)
+    return root
+
+def make_track_videos(out_dir, count=3, seconds=5.0, size=(208, 192), fps=24):
+    """Small H.264/AAC tracks like the pipeline's outputs, for the merge step (needs ffmpeg)"""
+    import subprocess
+
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(out_dir, f'track_{i + 1:02d}.mp4')
+        subprocess.run([
+            os.getenv('FFMPEG_BINARY', 'ffmpeg'), '-y', '-v', 'error',
+            '-f', 'lavfi', '-i', f'testsrc=size={size[0]}x{size[1]}:rate={fps}:duration={seconds}',
+            '-f', 'lavfi', '-i', f'sine=frequency={220 * (i + 1)}:duration={seconds}',
+            '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-shortest', path
+        ], check=True, capture_output=True)
+        paths.append(path)
+    return paths
+
+def make_progress_file(path, video_paths, album='Bench Album', artist='Bench Artist'):
+    """album_progress.json listing the given videos as completed tracks"""
+    tracks = [
+        {'track_id': f'{i + 1}_Track {i + 1}', 'title': f'Track {i + 1}', 'position': i + 1, 'video_path': video}
+        for i, video in enumerate(video_paths)
+    ]
+    with open(path, 'w') as f:
+        json.dump({'album': album, 'artist': artist, 'total_tracks': len(tracks),
+                   'completed_tracks': tracks, 'failed_tracks': [], 'status': 'completed'}, f, indent=2)
+    return path
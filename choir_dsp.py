@@ -0,0 +1,197 @@
+import os
+import tempfile
+from fractions import Fraction
+import numpy as np
+import soundfile as sf
+from scipy import signal
+
+SLOWDOWN = 0.8          # tempo factor
+PITCH_FACTOR = 0.887    # ~ -2 semitones
+LOWPASS_HZ = 8000
+ECHO_DELAY_MS = 200
+ECHO_DECAY = 0.4
+ECHO_TAPS = 3
+HEADROOM_DB = 2.1       # pydub normalize() headroom (0.1 dB) plus the extra -2 dB
+
+BLOCK_FRAMES = 1 << 18  # ~6s at 44.1kHz per block in the streaming engine
+
+def load_audio(path):
+    """Decode to a float32 (frames, channels) array"""
+    try:
+        audio, sample_rate = sf.read(path, dtype='float32', always_2d=True)
+    except RuntimeError:
+        # Formats libsndfile can't read (e.g. mp3) go through pydub/ffmpeg
+        from pydub import AudioSegment
+        segment = AudioSegment.from_file(path)
+        samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+        audio = samples.reshape(-1, segment.channels) / float(1 << (8 * segment.sample_width - 1))
+        sample_rate = segment.frame_rate
+    return audio, sample_rate
+
+def resample_ratio(sample_rate):
+    """
+    Single up/down ratio equivalent to reinterpreting the audio at 0.8x
+    then 0.887x of its rate and resampling back each time.
+    """
+    slowed = Fraction(sample_rate, int(sample_rate * SLOWDOWN))
+    pitched = Fraction(sample_rate, int(sample_rate * PITCH_FACTOR))
+    ratio = (slowed * pitched).limit_denominator(1000)
+    return ratio.numerator, ratio.denominator
+
+def reverb_impulse_response(sample_rate):
+    """Sparse cathedral echo: direct sound plus taps at 200/400/600ms at -4/-6/-8 dB"""
+    delay = int(sample_rate * ECHO_DELAY_MS / 1000)
+    ir = np.zeros(ECHO_TAPS * delay + 1, dtype=np.float32)
+    ir[0] = 1.0
+    for tap in range(1, ECHO_TAPS + 1):
+        ir[tap * delay] = 10 ** (-ECHO_DECAY * 5 * (tap + 1) / 20)
+    return ir
+
+def fir_full(audio, ir):
+    """
+    Full convolution of each channel with an impulse response.
+    Sparse echo IRs are applied as a handful of shifted adds; dense ones
+    (e.g. a measured cathedral IR) use overlap-add FFT convolution.
+    """
+    taps = np.flatnonzero(ir)
+    if len(taps) > 16:
+        return signal.oaconvolve(audio, ir[:, np.newaxis], axes=0).astype(np.float32, copy=False)
+    
+    out = np.zeros((len(audio) + len(ir) - 1, audio.shape[1]), dtype=np.float32)
+    for tap in taps:
+        out[tap:tap + len(audio)] += ir[tap] * audio
+    return out
+
+def apply_fir(audio, ir):
+    """FIR keeping the input length (the reverb tail is cut, like pydub's overlay)"""
+    return fir_full(audio, ir)[:len(audio)]
+
+def resample_filter(up, down):
+    """The anti-aliasing FIR resample_poly designs by default"""
+    max_rate = max(up, down)
+    return signal.firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+
+def apply_choir_effects(audio, sample_rate):
+    """Slow + pitch down, warmth low-pass, cathedral reverb and normalize, per channel"""
+    # 1+2. SLOW DOWN TO 0.8x AND PITCH SHIFT DOWN in one polyphase resample
+    up, down = resample_ratio(sample_rate)
+    audio = signal.resample_poly(audio, up, down, axis=0, window=resample_filter(up, down)).astype(np.float32, copy=False)
+    
+    # 3. LOW-PASS FILTER (zero-phase butterworth, warmth without harshness)
+    sos = signal.butter(4, LOWPASS_HZ / (sample_rate / 2), btype='low', output='sos')
+    audio = signal.sosfiltfilt(sos, audio, axis=0).astype(np.float32, copy=False)
+    
+    # Cathedral reverb as one FIR, tail truncated like pydub's overlay
+    audio = apply_fir(audio, reverb_impulse_response(sample_rate))
+    
+    peak = np.max(np.abs(audio))
+    if peak > 0:
+        audio *= np.float32(10 ** (-HEADROOM_DB / 20) / peak)
+    return audio
+
+def resample_blocks(blocks, n_in, channels, up, down, block_frames=BLOCK_FRAMES):
+    """
+    Yield resample_poly(x, up, down) of the concatenated input blocks,
+    block by block. Every step resamples `step` input frames with `margin`
+    frames of real context on both sides, so its outputs are identical to
+    the whole-signal result while only ~2 blocks are held in memory.
+    """
+    h = resample_filter(up, down)
+    half_len = (len(h) - 1) // 2
+    margin = -(-(half_len // up + 1) // down) * down  # multiple of down keeps outputs aligned
+    step = max(block_frames // down, 1) * down
+    n_out = -(-n_in * up // down)
+    out_margin = margin * up // down
+    out_step = step * up // down
+    
+    # resample_poly treats the signal as zero outside its bounds
+    buf = np.zeros((margin, channels), dtype=np.float32)
+    blocks = iter(blocks)
+    exhausted = False
+    produced = 0
+    
+    while produced < n_out:
+        while not exhausted and len(buf) < 2 * margin + step:
+            block = next(blocks, None)
+            if block is None:
+                exhausted = True
+            else:
+                buf = np.concatenate([buf, block])
+        
+        chunk = buf[:2 * margin + step]
+        if len(chunk) < 2 * margin + step:
+            padding = np.zeros((2 * margin + step - len(chunk), channels), dtype=np.float32)
+            chunk = np.concatenate([chunk, padding])
+        
+        y = signal.resample_poly(chunk, up, down, axis=0, window=h)
+        out = y[out_margin:out_margin + out_step][:n_out - produced]
+        produced += len(out)
+        buf = buf[step:]
+        yield out.astype(np.float32, copy=False)
+
+def apply_choir_effects_streaming(in_path, out_path, block_frames=BLOCK_FRAMES):
+    """
+    Block-based apply_choir_effects for very long songs, FLAC to FLAC.
+    
+    Same stages: the resample is exact across blocks, the low-pass carries
+    its filter state between blocks (a single causal pass, since filtfilt
+    needs the whole signal), the reverb tail is overlap-added into the next
+    block, and normalization is two-pass through a float32 temp file.
+    Peak memory is a few blocks regardless of song length.
+    Returns (frames written, sample rate).
+    """
+    decoded_path = None
+    try:
+        info = sf.info(in_path)
+    except RuntimeError:
+        # Formats libsndfile can't read (e.g. mp3) are decoded once to WAV
+        from pydub import AudioSegment
+        fd, decoded_path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        AudioSegment.from_file(in_path).export(decoded_path, format='wav')
+        in_path = decoded_path
+        info = sf.info(in_path)
+    
+    sample_rate, channels = info.samplerate, info.channels
+    up, down = resample_ratio(sample_rate)
+    
+    sos = signal.butter(4, LOWPASS_HZ / (sample_rate / 2), btype='low', output='sos')
+    zi = np.zeros((sos.shape[0], 2, channels))
+    ir = reverb_impulse_response(sample_rate)
+    tail = np.zeros((len(ir) - 1, channels), dtype=np.float32)
+    
+    peak = 0.0
+    n_frames = 0
+    fd, tmp_path = tempfile.mkstemp(suffix='.w64')
+    os.close(fd)
+    try:
+        # Pass 1: effects, tracking the peak
+        with sf.SoundFile(tmp_path, 'w', samplerate=sample_rate, channels=channels,
+                          format='W64', subtype='FLOAT') as tmp:
+            blocks = sf.blocks(in_path, blocksize=block_frames, dtype='float32', always_2d=True)
+            for block in resample_blocks(blocks, info.frames, channels, up, down, block_frames):
+                block, zi = signal.sosfilt(sos, block, axis=0, zi=zi)
+                
+                y = fir_full(block.astype(np.float32, copy=False), ir)
+                y[:len(tail)] += tail
+                tail = y[len(block):]
+                block = y[:len(block)]
+                
+                if len(block):
+                    peak = max(peak, float(np.max(np.abs(block))))
+                tmp.write(block)
+                n_frames += len(block)
+        
+        # Pass 2: normalize into the final FLAC
+        gain = np.float32(10 ** (-HEADROOM_DB / 20) / peak) if peak > 0 else np.float32(1.0)
+        with sf.SoundFile(out_path, 'w', samplerate=sample_rate, channels=channels,
+                          format='FLAC', subtype='PCM_16') as out:
+            for block in sf.blocks(tmp_path, blocksize=block_frames, dtype='float32', always_2d=True):
+                block *= gain
+                out.write(block)
+    finally:
+        os.remove(tmp_path)
+        if decoded_path:
+            os.remove(decoded_path)
+    
+    return n_frames, sample_rate
@@ -1,164 +1,446 @@
 import os
-import json
+import sys
 import random
+import shutil
 import zipfile
-import soundfile as sf
-import numpy as np
-from moviepy import VideoFileClip, AudioFileClip, concatenate_videoclips
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from disk_cache import make_key
+from gif_assets import SCALE_FLAGS, GifCache, GifIndex, plan_gif_timeline
+from merge_videos import FFMPEG, concat_stream_copy
+from workspace import TrackWorkspace
+import telemetry
 
 ZIP_PATH = 'data/giphy.zip'
 EXTRACT_DIR = 'gifs_extracted'
 OUTPUT_DIR = 'outputs'
-
-os.makedirs(EXTRACT_DIR, exist_ok=True)
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-print("📦 Extracting GIFs...")
-with zipfile.ZipFile(ZIP_PATH, 'r') as zip_ref:
-    zip_ref.extractall(EXTRACT_DIR)
-
-gif_files = [f for f in os.listdir(EXTRACT_DIR) if f.lower().endswith('.gif')]
-print(f"✓ Found {len(gif_files)} GIFs\n")
-
-# FIXED: Read metadata from lyrics_metadata.json if available
-if os.path.exists('lyrics_metadata.json'):
-    with open('lyrics_metadata.json', 'r') as f:
-        metadata = json.load(f)
-        title = metadata.get('title', 'Hey Jude')
-        artist = metadata.get('artist', 'The Beatles')
-else:
-    # Fallback to environment variables or defaults
-    title = os.getenv('SONG_TITLE', 'Hey Jude')
-    artist = os.getenv('SONG_ARTIST', 'The Beatles')
-
-song_filename = f"{title.replace(' ', '_').lower()}_ai_cover_slowed.flac"
-
-if not os.path.exists(song_filename):
-    print(f"❌ Error: Audio file '{song_filename}' not found!")
-    print("Run generate_song.py first to create the audio file.")
-    exit(1)
-
-print("🎵 Converting song to WAV...")
-audio_data, sample_rate = sf.read(song_filename)
-wav_path = os.path.join(OUTPUT_DIR, 'song.wav')
-sf.write(wav_path, audio_data, sample_rate)
-
-audio_clip = AudioFileClip(wav_path)
-audio_duration = audio_clip.duration
-print(f"✓ Song duration: {audio_duration:.2f}s\n")
+USE_GIF_CACHE = os.getenv('GIF_CACHE', '1') != '0'
+RENDERER = os.getenv('VIDEO_RENDERER', 'stream')
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', '1'))
 
 TARGET_WIDTH = 2080
 TARGET_HEIGHT = 1920
+FPS = 24
 
-def load_and_process_gif(gif_path):
-    """Load and resize a single GIF"""
-    try:
-        clip = VideoFileClip(gif_path)
-        
-        clip_aspect = clip.w / clip.h
-        target_aspect = TARGET_WIDTH / TARGET_HEIGHT
+class GifSource:
+    """
+    The GIF collection videos draw from: the header index plus the
+    normalized clip cache (or an extracted copy of the zip). Build it once
+    and share it across tracks.
+    """
+    
+    def __init__(self, zip_path=ZIP_PATH, use_cache=USE_GIF_CACHE, extract_dir=EXTRACT_DIR):
+        self.index = GifIndex(zip_path)
+        self.gif_files = self.index.gif_files()
+        self.extract_dir = extract_dir
         
-        if clip_aspect > target_aspect:
-            new_height = TARGET_HEIGHT
-            new_width = int(clip.w * (TARGET_HEIGHT / clip.h))
-            clip = clip.resized(height=new_height)
-            x_center = (new_width - TARGET_WIDTH) // 2
-            clip = clip.cropped(x1=x_center, width=TARGET_WIDTH)
+        if use_cache:
+            self.cache = GifCache(zip_path, TARGET_WIDTH, TARGET_HEIGHT, fps=FPS)
         else:
-            new_width = TARGET_WIDTH
-            new_height = int(clip.h * (TARGET_WIDTH / clip.w))
-            clip = clip.resized(width=new_width)
-            y_center = (new_height - TARGET_HEIGHT) // 2
-            clip = clip.cropped(y1=y_center, height=TARGET_HEIGHT)
-        
-        return clip
+            self.cache = None
+            os.makedirs(extract_dir, exist_ok=True)
+            print("📦 Extracting GIFs...")
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                zip_ref.extractall(extract_dir)
+        print(f"✓ Found {len(self.gif_files)} GIFs\n")
+    
+    def durations(self):
+        return {g: self.index.duration(g) for g in self.gif_files}
+    
+    def load(self, gif_file):
+        """Load a GIF already at target size, from the normalized cache when enabled"""
+        with telemetry.span('gif_load', cached=self.cache is not None):
+            if self.cache is None:
+                return load_and_process_gif(os.path.join(self.extract_dir, gif_file))
+            
+            cached_path = self.cache.get(gif_file)
+            if cached_path is None:
+                return None
+            
+            from moviepy import VideoFileClip
+            try:
+                return VideoFileClip(cached_path, audio=False)
+            except Exception as e:
+                print(f"  ⚠ Error loading cached {os.path.basename(gif_file)}: {e}")
+                return None
+    
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+def load_and_process_gif(gif_path):
+    """Load a single GIF, scaled to fill and center-cropped to the target size by ffmpeg"""
+    try:
+        from gif_clip import GifClip
+        return GifClip(gif_path, TARGET_WIDTH, TARGET_HEIGHT)
     except Exception as e:
         print(f"  ⚠ Error loading {os.path.basename(gif_path)}: {e}")
         return None
 
-def get_random_clips_no_repeat(gif_files, target_duration):
+def get_random_clips_no_repeat(source, target_duration):
     """
     Get clips in random order without repeating until all are used.
     When exhausted, reshuffle and continue.
+    The playlist is planned from GIF header durations first, so only the
+    clips that end up in the video are opened, each trimmed to its span.
     """
+    gif_files = source.gif_files
+    durations = source.durations()
     video_clips = []
     total_duration = 0
-    available_gifs = gif_files.copy()
-    random.shuffle(available_gifs)
-    
-    used_count = 0
     rounds = 0
     
     print(f"🎬 Loading GIFs randomly (target: {target_duration:.2f}s)...\n")
     
-    while total_duration < target_duration:
-        if not available_gifs:
-            rounds += 1
-            print(f"🔄 Round {rounds} complete, reshuffling...\n")
-            available_gifs = gif_files.copy()
-            random.shuffle(available_gifs)
-        
-        gif_file = available_gifs.pop(0)
-        gif_path = os.path.join(EXTRACT_DIR, gif_file)
+    # Re-plan only the shortfall when a clip fails to open or is shorter than its header said
+    while target_duration - total_duration > 0.5 / FPS:
+        plan, plan_rounds = plan_gif_timeline(gif_files, durations, target_duration - total_duration)
+        if not plan:
+            break
+        rounds += plan_rounds
+        if plan_rounds:
+            print(f"🔄 Playlist spans {plan_rounds + 1} shuffles of the GIF collection\n")
         
-        clip = load_and_process_gif(gif_path)
-        if clip:
+        for gif_file, span in plan:
+            clip = source.load(gif_file)
+            if clip is None:
+                durations[gif_file] = None
+                continue
+            
+            if span < clip.duration:
+                clip = clip.subclipped(0, span)
             video_clips.append(clip)
             total_duration += clip.duration
-            used_count += 1
             
-            if used_count % 5 == 0:
-                print(f"  Loaded {used_count} GIFs (duration: {total_duration:.2f}s / {target_duration:.2f}s)")
+            if len(video_clips) % 5 == 0:
+                print(f"  Loaded {len(video_clips)} GIFs (duration: {total_duration:.2f}s / {target_duration:.2f}s)")
     
     print(f"\n✓ Loaded {len(video_clips)} GIFs (total: {total_duration:.2f}s)")
     print(f"✓ Went through {rounds + 1} round(s) of the GIF collection\n")
     
     return video_clips
 
-video_clips = get_random_clips_no_repeat(gif_files, audio_duration)
-
-if len(video_clips) == 0:
-    print("❌ No GIFs loaded successfully!")
-    exit(1)
-
-print("🎞️ Combining clips and adding music...")
-full_sequence = concatenate_videoclips(video_clips, method="compose")
-final_video = full_sequence.subclipped(0, audio_duration)
-final_video = final_video.with_audio(audio_clip)
-
-# FIXED: Use consistent filename format that album_pipeline.py expects
-output_filename = f'{title.replace(" ", "_").lower()}_lofi_music_video.mp4'
-output_path = os.path.join(OUTPUT_DIR, output_filename)
-print(f"💾 Rendering final video to: {output_path}\n")
-
-final_video.write_videofile(
-    output_path, 
-    fps=24, 
-    codec='libx264', 
-    audio_codec='aac',
-    logger=None
-)
-
-# FIXED: Verify file was created
-if not os.path.exists(output_path):
-    print(f"❌ ERROR: Video file was not created at {output_path}")
-    exit(1)
-
-file_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
-
-print("=" * 60)
-print("✅ MUSIC VIDEO CREATED!")
-print("=" * 60)
-print(f"📁 Output: {output_path}")
-print(f"📦 Size: {file_size:.2f} MB")
-print(f"🎵 Song: '{title}' by {artist} (Lofi 0.8x)")
-print(f"⏱️  Duration: {audio_duration:.2f}s")
-print(f"🎬 GIFs used: {len(video_clips)}")
-print("=" * 60)
-
-audio_clip.close()
-final_video.close()
-for clip in video_clips:
-    clip.close()
-
-print("\n✓ Done!")
+def open_planned_gif(source, gif_file, durations):
+    """Open a planned GIF, substituting a random playable one if it fails to load"""
+    clip = source.load(gif_file)
+    while clip is None:
+        durations[gif_file] = None
+        candidates = [g for g, d in durations.items() if d]
+        if not candidates:
+            return None
+        gif_file = random.choice(candidates)
+        clip = source.load(gif_file)
+    return clip
+
+def write_timeline_frames(source, plan, durations, writer, first_frame, last_frame):
+    """
+    Write frames [first_frame, last_frame) of the planned timeline.
+    Each GIF is opened just before its first frame and closed after its last,
+    so only one decoder is alive at any time.
+    """
+    frame_index = first_frame
+    clip_start = 0.0
+    last_image = None
+    
+    for gif_file, span in plan:
+        clip_end = clip_start + span
+        if frame_index >= last_frame:
+            break
+        if frame_index / FPS >= clip_end:
+            clip_start = clip_end
+            continue
+        
+        clip = open_planned_gif(source, gif_file, durations)
+        if clip is None:
+            break
+        
+        last_t = max(clip.duration - 1.0 / FPS, 0)
+        while frame_index < last_frame and frame_index / FPS < clip_end:
+            last_image = clip.get_frame(min(frame_index / FPS - clip_start, last_t))
+            writer.write_frame(last_image)
+            frame_index += 1
+        
+        clip.close()
+        clip_start = clip_end
+    
+    # Header durations may undershoot by a frame; hold the last image
+    while last_image is not None and frame_index < last_frame:
+        writer.write_frame(last_image)
+        frame_index += 1
+    
+    return frame_index - first_frame
+
+def render_streaming(source, plan, durations, audio_path, output_path, duration):
+    """Pipe the planned timeline frame by frame into one ffmpeg encoder, muxing the song audio"""
+    from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+    n_frames = int(duration * FPS)
+    with FFMPEG_VideoWriter(
+        output_path,
+        (TARGET_WIDTH, TARGET_HEIGHT),
+        FPS,
+        codec='libx264',
+        audiofile=audio_path,
+        audio_codec='aac'
+    ) as writer:
+        written = write_timeline_frames(source, plan, durations, writer, 0, n_frames)
+    return written
+
+class SegmentSource:
+    """
+    Picklable stand-in for GifSource in segment workers: opens GIFs from
+    files prepared by the parent (normalized cache entries or extracted
+    GIFs) and never touches the zip.
+    """
+    
+    def __init__(self, paths, cached):
+        self.paths = paths
+        self.cached = cached
+    
+    def load(self, gif_file):
+        path = self.paths.get(gif_file)
+        if path is None:
+            return None
+        if not self.cached:
+            return load_and_process_gif(path)
+        from moviepy import VideoFileClip
+        try:
+            return VideoFileClip(path, audio=False)
+        except Exception as e:
+            print(f"  ⚠ Error loading cached {os.path.basename(gif_file)}: {e}")
+            return None
+
+def render_segment(source, plan, durations, segment_path, first_frame, last_frame):
+    """Encode frames [first_frame, last_frame) of the timeline to a video-only file"""
+    from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+    with FFMPEG_VideoWriter(segment_path, (TARGET_WIDTH, TARGET_HEIGHT), FPS, codec='libx264') as writer:
+        return write_timeline_frames(source, plan, durations, writer, first_frame, last_frame)
+
+def warm_planned_gifs(source, plan, durations):
+    """
+    Make sure every planned GIF is in the normalized cache before workers
+    start, replacing the ones that fail. Workers then only read cached files
+    and never touch the shared zip handle.
+    """
+    warmed = []
+    for gif_file, span in plan:
+        while source.cache.get(gif_file) is None:
+            durations[gif_file] = None
+            candidates = [g for g, d in durations.items() if d]
+            if not candidates:
+                return []
+            gif_file = random.choice(candidates)
+        warmed.append((gif_file, span))
+    return warmed
+
+def render_parallel(source, plan, durations, audio_path, output_path, duration, workers, work_dir=OUTPUT_DIR):
+    """
+    Split the timeline into contiguous frame ranges, encode each in its own
+    process, stream-copy the segments together and mux the audio once.
+    The frame count is the same as render_streaming's.
+    """
+    n_frames = int(duration * FPS)
+    bounds = [n_frames * i // workers for i in range(workers + 1)]
+    ranges = [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+    
+    if source.cache is not None:
+        plan = warm_planned_gifs(source, plan, durations)
+        # Only planned GIFs are warmed; workers substitute among those
+        paths = {g: source.cache.get(g) for g, _ in plan}
+    else:
+        paths = {g: os.path.join(source.extract_dir, g) for g in durations if durations[g]}
+    segment_source = SegmentSource(paths, cached=source.cache is not None)
+    durations = {g: d for g, d in durations.items() if g in paths}
+    
+    temp_dir = tempfile.mkdtemp(prefix='render_segments_', dir=work_dir)
+    try:
+        segment_paths = [os.path.join(temp_dir, f'segment_{i:03d}.mp4') for i in range(len(ranges))]
+        
+        # spawn, not fork: the album pipeline renders from worker threads
+        with telemetry.span('encode', workers=len(ranges)), \
+                ProcessPoolExecutor(max_workers=len(ranges), mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [
+                pool.submit(render_segment, segment_source, plan, durations, path, first, last)
+                for path, (first, last) in zip(segment_paths, ranges)
+            ]
+            written = sum(f.result() for f in futures)
+        
+        print(f"🔗 Joining {len(segment_paths)} segments and muxing audio...")
+        video_only_path = os.path.join(temp_dir, 'video.mp4')
+        with telemetry.span('concat', segments=len(segment_paths)):
+            concat_stream_copy(segment_paths, video_only_path)
+            subprocess.run([
+                FFMPEG, '-y', '-v', 'error',
+                '-i', video_only_path,
+                '-i', audio_path,
+                '-map', '0:v:0', '-map', '1:a:0',
+                '-c:v', 'copy',
+                '-c:a', 'aac',
+                '-movflags', '+faststart',
+                output_path
+            ], check=True, capture_output=True, text=True)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    return written
+
+def video_filename(title):
+    # FIXED: Use consistent filename format that album_pipeline.py expects
+    return f'{title.replace(" ", "_").lower()}_lofi_music_video.mp4'
+
+def render_mode(renderer=RENDERER, workers=RENDER_WORKERS):
+    """The renderer create_video actually uses for these arguments: compose, stream or parallel-<workers>"""
+    if renderer == 'compose' or workers <= 1:
+        return renderer
+    return f"parallel-{workers}"
+
+def gif_set_digest(zip_path=ZIP_PATH):
+    """Digest of the GIF collection videos draw from (member names and CRCs)"""
+    return GifIndex(zip_path).digest()
+
+def video_key(song_hash, title, gif_digest, renderer=RENDERER, workers=RENDER_WORKERS):
+    """Artifact key of the video rendered for a choir FLAC at the current output settings and GIF collection"""
+    return make_key(song_hash, title, TARGET_WIDTH, TARGET_HEIGHT, FPS, SCALE_FLAGS,
+                    render_mode(renderer, workers), gif_digest)
+
+def song_duration(song_path):
+    """Length of a song in seconds, read from the file header without decoding the audio"""
+    import soundfile as sf
+    try:
+        return sf.info(song_path).duration
+    except RuntimeError:
+        # Formats libsndfile can't parse (e.g. mp3): ask ffmpeg
+        from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+        return ffmpeg_parse_infos(song_path)['duration']
+
+def create_video(source, song_path, title, output_dir=OUTPUT_DIR, renderer='stream', workers=1, work_dir=None):
+    """
+    Render the music video for a processed song over GIFs from `source`
+    into output_dir. Intermediate files go to work_dir (default output_dir).
+    Returns {'video': path, 'duration': seconds, 'gifs_used': count}.
+    """
+    from moviepy import concatenate_videoclips
+    
+    if not os.path.exists(song_path):
+        raise FileNotFoundError(f"Audio file '{song_path}' not found")
+    os.makedirs(output_dir, exist_ok=True)
+    work_dir = work_dir or output_dir
+    
+    # The encoders mux the FLAC directly; nothing is decoded here
+    audio_duration = song_duration(song_path)
+    print(f"🎵 Song duration: {audio_duration:.2f}s\n")
+    
+    output_path = os.path.join(output_dir, video_filename(title))
+    
+    if renderer == 'compose':
+        if workers > 1:
+            print("⚠️  --workers only applies to the stream renderer, rendering single-process\n")
+        video_clips = get_random_clips_no_repeat(source, audio_duration)
+        
+        if len(video_clips) == 0:
+            raise RuntimeError("No GIFs loaded successfully!")
+        
+        print("🎞️ Combining clips and adding music...")
+        with telemetry.span('concat', clips=len(video_clips)):
+            full_sequence = concatenate_videoclips(video_clips, method="compose")
+        final_video = full_sequence.subclipped(0, min(audio_duration, full_sequence.duration))
+        
+        print(f"💾 Rendering final video to: {output_path}\n")
+        
+        with telemetry.span('encode', renderer='compose'):
+            # ffmpeg reads the FLAC itself while encoding the AAC track
+            final_video.write_videofile(
+                output_path, 
+                fps=FPS, 
+                codec='libx264', 
+                audio=song_path,
+                audio_codec='aac',
+                logger=None
+            )
+        gifs_used = len(video_clips)
+        
+        final_video.close()
+        for clip in video_clips:
+            clip.close()
+    else:
+        durations = source.durations()
+        plan, rounds = plan_gif_timeline(source.gif_files, durations, audio_duration)
+        
+        if not plan:
+            raise RuntimeError("No playable GIFs found!")
+        
+        print(f"🎬 Planned {len(plan)} GIFs over {rounds + 1} round(s) of the GIF collection")
+        
+        if workers > 1:
+            print(f"💾 Rendering {workers} segments in parallel to: {output_path}\n")
+            written = render_parallel(source, plan, durations, song_path, output_path, audio_duration, workers, work_dir)
+        else:
+            print(f"💾 Streaming frames to: {output_path}\n")
+            with telemetry.span('encode', renderer='stream'):
+                written = render_streaming(source, plan, durations, song_path, output_path, audio_duration)
+        if written == 0:
+            raise RuntimeError("No GIFs loaded successfully!")
+        gifs_used = len(plan)
+    
+    # FIXED: Verify file was created
+    if not os.path.exists(output_path):
+        raise RuntimeError(f"Video file was not created at {output_path}")
+    
+    return {'video': output_path, 'duration': audio_duration, 'gifs_used': gifs_used}
+
+def main():
+    parser = argparse.ArgumentParser(description="Create a music video from the generated song and GIFs")
+    parser.add_argument('--renderer', choices=['stream', 'compose'], default=RENDERER,
+                        help="stream: one GIF open at a time, frames piped to a single encoder (constant memory); "
+                             "compose: moviepy concatenate_videoclips over all clips")
+    parser.add_argument('--workers', type=int, default=RENDER_WORKERS,
+                        help="Render the stream timeline in this many parallel time segments")
+    parser.add_argument('--workspace', default='.',
+                        help="Track directory holding the lyrics metadata and song; temp files go there too")
+    args = parser.parse_args()
+    workspace = TrackWorkspace(args.workspace)
+    
+    # FIXED: Read metadata from lyrics_metadata.json if available
+    metadata = workspace.load_metadata()
+    title = metadata['title']
+    artist = metadata['artist']
+    
+    song_filename = workspace.choir_song_path(title)
+    
+    if not os.path.exists(song_filename):
+        print(f"❌ Error: Audio file '{song_filename}' not found!")
+        print("Run generate_song.py first to create the audio file.")
+        sys.exit(1)
+    
+    # Each workspace gets its own extraction so concurrent runs don't share a half-written directory
+    source = GifSource(extract_dir=workspace.path(EXTRACT_DIR))
+    
+    try:
+        video = create_video(source, song_filename, title, renderer=args.renderer, workers=args.workers,
+                             work_dir=workspace.root)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    
+    file_size = os.path.getsize(video['video']) / (1024 * 1024)  # MB
+    
+    print("=" * 60)
+    print("✅ MUSIC VIDEO CREATED!")
+    print("=" * 60)
+    print(f"📁 Output: {video['video']}")
+    print(f"📦 Size: {file_size:.2f} MB")
+    print(f"🎵 Song: '{title}' by {artist} (Lofi 0.8x)")
+    print(f"⏱️  Duration: {video['duration']:.2f}s")
+    print(f"🎬 GIFs used: {video['gifs_used']}")
+    if source.cache is not None:
+        print(f"🗃️  GIF cache: {source.cache.hits} hits, {source.cache.misses} misses")
+    print("=" * 60)
+    
+    source.close()
+    
+    print("\n✓ Done!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+CACHE_PATH = os.getenv('PIPELINE_CACHE_PATH', os.path.join('data', 'pipeline_cache.sqlite'))
+CACHE_MAX_MB = int(os.getenv('PIPELINE_CACHE_MAX_MB', '256'))
+
+DAY = 24 * 60 * 60
+
+def make_key(*parts) -> str:
+    """Stable hash key from any number of string parts"""
+    return hashlib.sha256('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+class DiskCache:
+    """
+    SQLite-backed JSON key/value store shared by the pipeline stages.
+
+    Entries live in namespaces, carry an optional TTL and are evicted least
+    recently used first once the stored values exceed max_bytes. With
+    refresh=True reads always miss but writes still land, so a run can
+    repopulate stale entries.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_MB * 1024 * 1024, refresh: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                expires REAL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        self._conn.commit()
+
+    def get(self, namespace: str, key: str):
+        """Return the cached value, or None on a miss or an expired entry"""
+        if self.refresh:
+            self.misses += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires FROM entries WHERE namespace = ? AND key = ?',
+                (namespace, key)
+            ).fetchone()
+
+            if row is None or (row[1] is not None and row[1] < now):
+                if row is not None:
+                    self._conn.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                'UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?',
+                (now, namespace, key)
+            )
+            self._conn.commit()
+
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value, ttl: float = None):
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        expires = now + ttl if ttl else None
+
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (namespace, key, value, size, created, expires, accessed) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (namespace, key, data, len(data.encode('utf-8')), now, expires, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute('DELETE FROM entries WHERE expires IS NOT NULL AND expires < ?', (now,))
+
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute('SELECT namespace, key, size FROM entries ORDER BY accessed').fetchall()
+        for namespace, key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+            total -= size
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
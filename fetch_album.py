@@ -1,113 +1,292 @@
+import os
 import json
-import yt_dlp
-import musicbrainzngs
+import argparse
 import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
 from pathlib import Path
+from disk_cache import DiskCache, make_key, DAY
 
-musicbrainzngs.set_useragent("AlbumVideoGenerator", "1.0", "contact@example.com")
+MUSICBRAINZ_RPS = float(os.getenv('MUSICBRAINZ_RPS', '1'))
+MB_SEARCH_TTL = 7 * DAY
+MB_RELEASE_TTL = 90 * DAY
 
-def get_album_info(artist, album):
-    print(f"🔍 Searching MusicBrainz for: {artist} - {album}")
+YOUTUBE_WORKERS = int(os.getenv('YOUTUBE_WORKERS', '8'))
+YOUTUBE_TIMEOUT = float(os.getenv('YOUTUBE_TIMEOUT', '30'))
+
+YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': True,
+    'default_search': 'ytsearch1',
+}
+
+class RequestScheduler:
+    """
+    Spaces calls to one service at least 1/rate seconds apart, across all
+    threads: each caller reserves the next free slot and sleeps until it.
+    """
     
-    try:
-        result = musicbrainzngs.search_releases(
+    def __init__(self, rate=MUSICBRAINZ_RPS):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+        self.waited = 0.0
+    
+    def call(self, fn, *args, **kwargs):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+            self.waited += start - now
+        if start > now:
+            time.sleep(start - now)
+        return fn(*args, **kwargs)
+
+class MusicBrainzClient:
+    """
+    MusicBrainz release searches and lookups through the shared DiskCache
+    (namespaces 'mb_search' and 'mb_release'), with every request that
+    misses the cache paced by one RequestScheduler. Safe to share between
+    threads; repeated lookups of an artist's catalogue cost no requests.
+    """
+    
+    def __init__(self, cache=None, scheduler=None):
+        import musicbrainzngs
+        musicbrainzngs.set_useragent("AlbumVideoGenerator", "1.0", "contact@example.com")
+        # We pace requests ourselves, across threads
+        musicbrainzngs.set_rate_limit(False)
+        self.mb = musicbrainzngs
+        self.cache = cache
+        self.scheduler = scheduler or RequestScheduler()
+        self.requests = 0
+    
+    def _cached(self, namespace, key, ttl, fetch):
+        if self.cache is not None:
+            cached = self.cache.get(namespace, key)
+            if cached is not None:
+                return cached
+        
+        result = self.scheduler.call(fetch)
+        self.requests += 1
+        if self.cache is not None:
+            self.cache.set(namespace, key, result, ttl=ttl)
+        return result
+    
+    def search_releases(self, artist, album, limit=5):
+        key = make_key(artist.strip().lower(), album.strip().lower(), limit)
+        return self._cached('mb_search', key, MB_SEARCH_TTL, lambda: self.mb.search_releases(
             artist=artist,
             release=album,
-            limit=5
-        )
-        
-        if not result['release-list']:
-            print("❌ Album not found in MusicBrainz")
-            return None
-        
-        release = result['release-list'][0]
-        release_id = release['id']
-        
-        print(f"✓ Found: {release['title']} by {release['artist-credit'][0]['artist']['name']}")
-        
-        release_info = musicbrainzngs.get_release_by_id(
+            limit=limit
+        ))
+    
+    def get_release(self, release_id, includes=('recordings', 'artist-credits')):
+        key = make_key(release_id, *sorted(includes))
+        return self._cached('mb_release', key, MB_RELEASE_TTL, lambda: self.mb.get_release_by_id(
             release_id,
-            includes=['recordings', 'artist-credits']
-        )
-        
-        tracks = []
-        for medium in release_info['release']['medium-list']:
-            for track in medium['track-list']:
-                tracks.append({
-                    'position': track['position'],
-                    'title': track['recording']['title'],
-                    'length': track.get('length', 'Unknown')
-                })
-        
-        album_data = {
-            'album': release['title'],
-            'artist': release['artist-credit'][0]['artist']['name'],
-            'release_date': release.get('date', 'Unknown'),
-            'track_count': len(tracks),
-            'tracks': tracks
-        }
-        
-        print(f"✓ Found {len(tracks)} tracks")
-        return album_data
+            includes=list(includes)
+        ))
+    
+    def album_info(self, artist, album):
+        print(f"🔍 Searching MusicBrainz for: {artist} - {album}")
         
-    except Exception as e:
-        print(f"❌ MusicBrainz error: {e}")
+        try:
+            result = self.search_releases(artist, album)
+            
+            if not result['release-list']:
+                print("❌ Album not found in MusicBrainz")
+                return None
+            
+            release = result['release-list'][0]
+            release_id = release['id']
+            
+            print(f"✓ Found: {release['title']} by {release['artist-credit'][0]['artist']['name']}")
+            
+            release_info = self.get_release(release_id)
+            
+            tracks = []
+            for medium in release_info['release']['medium-list']:
+                for track in medium['track-list']:
+                    tracks.append({
+                        'position': track['position'],
+                        'title': track['recording']['title'],
+                        'length': track.get('length', 'Unknown')
+                    })
+            
+            album_data = {
+                'album': release['title'],
+                'artist': release['artist-credit'][0]['artist']['name'],
+                'release_date': release.get('date', 'Unknown'),
+                'track_count': len(tracks),
+                'tracks': tracks
+            }
+            
+            print(f"✓ Found {len(tracks)} tracks")
+            return album_data
+            
+        except Exception as e:
+            print(f"❌ MusicBrainz error: {e}")
+            return None
+    
+    def album_info_bulk(self, pairs, workers=4):
+        """album_info for every (artist, album) pair, concurrently within the rate limit; results in input order"""
+        # Duplicates would race past the cache, so each distinct pair is looked up once
+        unique = list(dict.fromkeys(tuple(pair) for pair in pairs))
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='musicbrainz') as executor:
+            found = dict(zip(unique, executor.map(lambda pair: self.album_info(*pair), unique)))
+        return [found[tuple(pair)] for pair in pairs]
+
+def get_album_info(artist, album, client=None):
+    """album_info through client, or through a client on its own DiskCache that is closed afterwards"""
+    if client is not None:
+        return client.album_info(artist, album)
+    
+    client = MusicBrainzClient(DiskCache())
+    try:
+        return client.album_info(artist, album)
+    finally:
+        client.cache.close()
+
+def youtube_ydl(timeout=YOUTUBE_TIMEOUT):
+    """A YoutubeDL for flat ytsearch1 lookups"""
+    import yt_dlp
+    return yt_dlp.YoutubeDL(dict(YDL_OPTS, socket_timeout=timeout))
+
+class YoutubeResolver:
+    """
+    Runs `ytsearch1:` lookups on a thread pool. Each worker thread keeps
+    one extractor (from ydl_factory, a YoutubeDL by default) for all its
+    lookups; results come back in query order, a lookup that raises or
+    exceeds `timeout` seconds yields its exception instead.
+    close() waits up to `timeout` for lookups still running; an extractor
+    whose lookup outlives that is closed by its own thread when it returns.
+    Pass a stub ydl_factory to exercise it without the network.
+    """
+    
+    def __init__(self, workers=YOUTUBE_WORKERS, timeout=YOUTUBE_TIMEOUT, ydl_factory=None):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.ydl_factory = ydl_factory or (lambda: youtube_ydl(timeout))
+        self._local = threading.local()
+        self._instances = []
+        self._busy = set()
+        self._orphans = set()
+        self._pending = set()
+        self._lock = threading.Lock()
+    
+    def _ydl(self):
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = self._local.ydl = self.ydl_factory()
+            with self._lock:
+                self._instances.append(ydl)
+        return ydl
+    
+    def search(self, query):
+        """First search result entry for query, or None"""
+        ydl = self._ydl()
+        with self._lock:
+            self._busy.add(id(ydl))
+        try:
+            info = ydl.extract_info(f"ytsearch1:{query}", download=False)
+        finally:
+            with self._lock:
+                self._busy.discard(id(ydl))
+                orphaned = id(ydl) in self._orphans
+                self._orphans.discard(id(ydl))
+            if orphaned:
+                # close() gave up waiting on this lookup and left the extractor to us
+                self._local.ydl = None
+                if hasattr(ydl, 'close'):
+                    ydl.close()
+        if info and info.get('entries'):
+            return info['entries'][0]
         return None
+    
+    def resolve(self, queries):
+        """search() for every query concurrently; [entry, None or exception] in query order"""
+        results = []
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ytsearch')
+        futures = []
+        try:
+            futures.extend(executor.submit(self.search, query) for query in queries)
+            with self._lock:
+                self._pending.update(futures)
+            for future in futures:
+                future.add_done_callback(self._forget)
+            for future in futures:
+                try:
+                    results.append(future.result(timeout=self.timeout))
+                except FuturesTimeout:
+                    future.cancel()
+                    results.append(TimeoutError(f"no result within {self.timeout:.0f}s"))
+                except Exception as e:
+                    results.append(e)
+        finally:
+            # Don't wait on lookups that already timed out
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+        return results
+    
+    def _forget(self, future):
+        with self._lock:
+            self._pending.discard(future)
+    
+    def close(self):
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending, timeout=self.timeout)
+        
+        with self._lock:
+            idle = [ydl for ydl in self._instances if id(ydl) not in self._busy]
+            self._orphans.update(id(ydl) for ydl in self._instances if id(ydl) in self._busy)
+            self._instances = []
+        for ydl in idle:
+            if hasattr(ydl, 'close'):
+                ydl.close()
 
-def get_youtube_urls(artist, album_data):
+def get_youtube_urls(artist, album_data, resolver=None):
     print(f"\n🔍 Searching YouTube for {album_data['track_count']} tracks...")
     
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'extract_flat': True,
-        'default_search': 'ytsearch1',
-    }
+    own_resolver = resolver is None
+    if own_resolver:
+        resolver = YoutubeResolver()
+    
+    try:
+        queries = [f"{artist} {track['title']}" for track in album_data['tracks']]
+        results = resolver.resolve(queries)
+    finally:
+        if own_resolver:
+            resolver.close()
     
     tracks_with_urls = []
     
-    for track in album_data['tracks']:
-        search_query = f"{artist} {track['title']}"
+    for track, video in zip(album_data['tracks'], results):
+        entry = {
+            'position': track['position'],
+            'title': track['title'],
+            'length': track['length'],
+            'youtube_url': None,
+            'youtube_title': None,
+            'youtube_id': None
+        }
         
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(f"ytsearch1:{search_query}", download=False)
-                
-                if 'entries' in info and info['entries']:
-                    video = info['entries'][0]
-                    youtube_url = f"https://www.youtube.com/watch?v={video['id']}"
-                    
-                    tracks_with_urls.append({
-                        'position': track['position'],
-                        'title': track['title'],
-                        'length': track['length'],
-                        'youtube_url': youtube_url,
-                        'youtube_title': video.get('title', ''),
-                        'youtube_id': video['id']
-                    })
-                    
-                    print(f"  ✓ {track['position']}. {track['title']}")
-                else:
-                    tracks_with_urls.append({
-                        'position': track['position'],
-                        'title': track['title'],
-                        'length': track['length'],
-                        'youtube_url': None,
-                        'youtube_title': None,
-                        'youtube_id': None
-                    })
-                    print(f"  ✗ {track['position']}. {track['title']} - Not found")
-                    
-        except Exception as e:
-            print(f"  ✗ {track['position']}. {track['title']} - Error: {e}")
-            tracks_with_urls.append({
-                'position': track['position'],
-                'title': track['title'],
-                'length': track['length'],
-                'youtube_url': None,
-                'youtube_title': None,
-                'youtube_id': None
+        if isinstance(video, Exception):
+            print(f"  ✗ {track['position']}. {track['title']} - Error: {video}")
+        elif video:
+            entry.update({
+                'youtube_url': f"https://www.youtube.com/watch?v={video['id']}",
+                'youtube_title': video.get('title', ''),
+                'youtube_id': video['id']
             })
+            print(f"  ✓ {track['position']}. {track['title']}")
+        else:
+            print(f"  ✗ {track['position']}. {track['title']} - Not found")
+        
+        tracks_with_urls.append(entry)
     
     album_data['tracks'] = tracks_with_urls
     return album_data
@@ -133,8 +312,8 @@ def save_album_data(album_data, filename=None):
     
     return filename
 
-def fetch_album(artist, album):
-    album_data = get_album_info(artist, album)
+def fetch_album(artist, album, client=None):
+    album_data = get_album_info(artist, album, client)
     
     if not album_data:
         return None
@@ -144,15 +323,77 @@ def fetch_album(artist, album):
     
     return album_data
 
-if __name__ == "__main__":
-    if len(sys.argv) == 3:
-        artist = sys.argv[1]
-        album = sys.argv[2]
+def fetch_albums(pairs, client=None, workers=4):
+    """
+    fetch_album for a list of (artist, album) pairs: the MusicBrainz lookups
+    are resolved in one bulk call, then each album's YouTube URLs are searched
+    with one shared resolver. Returns album data (or None) per pair.
+    """
+    own_client = client is None
+    if own_client:
+        client = MusicBrainzClient(DiskCache())
+    try:
+        infos = client.album_info_bulk(pairs, workers)
+    finally:
+        if own_client:
+            client.cache.close()
+    
+    resolver = YoutubeResolver()
+    try:
+        albums = []
+        for (artist, _), album_data in zip(pairs, infos):
+            if album_data:
+                album_data = get_youtube_urls(artist, album_data, resolver)
+                save_album_data(album_data)
+            albums.append(album_data)
+    finally:
+        resolver.close()
+    return albums
+
+def load_album_list(path):
+    """(artist, album) pairs from a JSON list of pairs or {'artist', 'album'} objects, or 'Artist - Album' lines"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    
+    if path.endswith('.json'):
+        entries = json.loads(text)
+        return [(e['artist'], e['album']) if isinstance(e, dict) else tuple(e) for e in entries]
+    
+    pairs = []
+    for line in text.splitlines():
+        if line.strip() and not line.lstrip().startswith('#'):
+            artist, album = line.split(' - ', 1)
+            pairs.append((artist.strip(), album.strip()))
+    return pairs
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch album track lists from MusicBrainz plus YouTube URLs")
+    parser.add_argument('artist', nargs='?')
+    parser.add_argument('album', nargs='?')
+    parser.add_argument('--bulk', help="File of albums to fetch in one go: JSON [[artist, album], ...] or 'Artist - Album' lines")
+    parser.add_argument('--workers', type=int, default=4, help="Albums looked up concurrently with --bulk")
+    args = parser.parse_args()
+    
+    client = MusicBrainzClient(DiskCache())
+    
+    if args.bulk:
+        pairs = load_album_list(args.bulk)
+        albums = fetch_albums(pairs, client, args.workers)
+        found = sum(1 for album_data in albums if album_data)
+        print(f"\n✅ Fetched {found}/{len(pairs)} albums "
+              f"({client.requests} MusicBrainz requests, {client.scheduler.waited:.1f}s rate-limit wait)")
+        client.cache.close()
+        sys.exit(0 if found == len(pairs) else 1)
+    
+    if args.artist and args.album:
+        artist = args.artist
+        album = args.album
     else:
         artist = input("Artist name: ")
         album = input("Album name: ")
     
-    album_data = fetch_album(artist, album)
+    album_data = fetch_album(artist, album, client)
+    client.cache.close()
     
     if album_data:
         print("\n📝 Sample tracks:")
@@ -161,4 +402,7 @@ if __name__ == "__main__":
             print(f"     YouTube: {track['youtube_url']}")
     else:
         print("❌ Failed to fetch album")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
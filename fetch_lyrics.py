@@ -1,28 +1,139 @@
 import re
 import os
+import heapq
 import json
 import sys
+import time
+import asyncio
+import argparse
 from pathlib import Path
 from typing import Optional, Dict, List, Tuple
 from collections import Counter
-from groq import Groq
+from disk_cache import DiskCache, make_key, DAY
+from groq_keys import KeyPool, estimate_tokens
+from workspace import TrackWorkspace, LYRICS_FILE, METADATA_FILE
+from telemetry import span
+
+STRUCTURE_MODEL = "llama-3.3-70b-versatile"
+STRUCTURE_TEMPERATURE = 0.2
+STRUCTURE_MAX_TOKENS = 4000
+
+LRCLIB_TTL = 30 * DAY
+LRCLIB_MISS_TTL = 1 * DAY
+STRUCTURED_TTL = 180 * DAY
+
+STRUCTURE_PROMPT = """Format these lyrics for AI choir music generation. CRITICAL RULES:
+
+CHOIR THEME: Emphasize group vocals, harmonies, and powerful collective singing
+
+STRUCTURE RULES:
+1. MUST START WITH: [verse] or [chorus] (NEVER [intro])
+2. ALLOWED TAGS: [verse], [chorus], [bridge], [inst-medium], [inst-long], [outro-short]
+3. NO [inst-short] allowed - only medium and long instrumentals
+4. ALWAYS end with [outro-short] (never medium or long outro)
+
+VERSE SPLITTING RULE:
+- IF a verse has MORE than 12 lines:
+  * Split at line 12
+  * Add " ; " on new line
+  * Add [inst-medium]
+  * Continue rest as [bridge]
+  * Add " ; " on new line
+  * Add [inst-medium] after bridge
+- IF we have say >2 chorus following each other:
+  * Add " ; " on new line
+  *  Add [inst-long] after odd numbers 1,3 etc
+  * Add next chorus on new line
+  
+  
+
+FORMATTING:
+1. Lyrics on separate lines AFTER the tag
+2. To add instrumental: end section with " ; " on new line, then instrumental tag
+3. NO numbers in tags
+4. Repeat [verse]/[chorus] for multiple sections{chorus_hint}
+
+Song: "{title}" by {artist}
+
+Lyrics:
+{lyrics}
+
+Output ONLY formatted lyrics. Remember: [outro-short] at the end, NO [inst-short]."""
+
+def normalize_query(text: str) -> str:
+    return ' '.join(text.casefold().split())
 
 class LyricsModule:
-    def __init__(self, api_keys: list):
+    def __init__(self, api_keys: list, cache: Optional[DiskCache] = None, pool: Optional[KeyPool] = None):
         self.api_keys = api_keys
-        self.current_key_index = 0
-        self.client = self._get_client()
+        self.pool = pool or KeyPool(api_keys)
+        self.clients = {}
+        self.cache = cache
     
-    def _get_client(self):
-        return Groq(api_key=self.api_keys[self.current_key_index])
+    def _get_client(self, key):
+        if key.index not in self.clients:
+            from groq import Groq
+            self.clients[key.index] = Groq(api_key=key.api_key)
+        return self.clients[key.index]
     
-    def _rotate_key(self):
-        self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-        self.client = self._get_client()
-        print(f"🔄 Rotated to API key {self.current_key_index + 1}/{len(self.api_keys)}")
+    def _structure_request(self, prompt: str) -> dict:
+        return dict(
+            model=STRUCTURE_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=STRUCTURE_TEMPERATURE,
+            max_tokens=STRUCTURE_MAX_TOKENS
+        )
+    
+    def _settle(self, key, raw, response, cost: int) -> str:
+        """Book a parsed response's headers and usage on its key; returns the formatted lyrics"""
+        usage = getattr(response, 'usage', None)
+        self.pool.record_response(key, raw.headers, cost, getattr(usage, 'total_tokens', None))
+        return self._format_structured(response.choices[0].message.content)
+    
+    def _record_failure(self, key, cost: int, error: Exception, title: str) -> bool:
+        """Book a failed call on its key; True if the key may be tried again"""
+        status = getattr(error, 'status_code', None)
+        if status == 429:
+            response = getattr(error, 'response', None)
+            self.pool.record_rate_limit(key, response.headers if response is not None else None)
+            print(f"⏳ Rate limited on {key.label} for '{title}', requeueing")
+            return True
+        
+        self.pool.record_error(key, cost, fatal=status in (401, 403, 404))
+        print(f"AI error for '{title}' on {key.label}: {error}")
+        return False
+    
+    def _cached_lrclib(self, title: str, artist: str) -> Tuple[str, Optional[Dict]]:
+        cache_key = make_key(normalize_query(title), normalize_query(artist))
+        if self.cache is None:
+            return cache_key, None
+        
+        # An empty dict records "no lyrics on LRClib"
+        return cache_key, self.cache.get('lrclib', cache_key)
+    
+    def _store_lrclib(self, cache_key: str, results: list) -> Optional[Dict]:
+        result = None
+        if results:
+            result = {
+                'plain_lyrics': results[0].get('plainLyrics', ''),
+                'synced_lyrics': results[0].get('syncedLyrics', ''),
+                'provider': 'lrclib'
+            }
+        
+        if self.cache is not None:
+            if result:
+                self.cache.set('lrclib', cache_key, result, ttl=LRCLIB_TTL)
+            else:
+                self.cache.set('lrclib', cache_key, {}, ttl=LRCLIB_MISS_TTL)
+        return result
     
     def fetch_raw_from_lrclib(self, title: str, artist: str) -> Optional[Dict]:
         """Fetch lyrics from LRClib API using requests"""
+        cache_key, cached = self._cached_lrclib(title, artist)
+        if cached is not None:
+            print("🗃️  Using cached LRClib result")
+            return cached or None
+        
         import requests
         try:
             url = "https://lrclib.net/api/search"
@@ -30,15 +141,10 @@ class LyricsModule:
                 "track_name": title,
                 "artist_name": artist
             }
-            response = requests.get(url, params=params)
+            with span('lrclib'):
+                response = requests.get(url, params=params)
             if response.status_code == 200:
-                results = response.json()
-                if results:
-                    return {
-                        'plain_lyrics': results[0].get('plainLyrics', ''),
-                        'synced_lyrics': results[0].get('syncedLyrics', ''),
-                        'provider': 'lrclib'
-                    }
+                return self._store_lrclib(cache_key, response.json())
         except Exception as e:
             print(f"LRClib error: {e}")
         return None
@@ -78,44 +184,56 @@ class LyricsModule:
         return result.strip()
     
     def detect_chorus_regex(self, lyrics: str, min_lines: int = 2, max_lines: int = 6) -> List[Tuple[str, int]]:
-        """Detect chorus by finding repeating line sequences"""
+        """Detect chorus by finding repeating line sequences.
+        
+        Lines are mapped to integer IDs and the suffixes of the ID sequence
+        are sorted (compared up to max_lines IDs). Every run of adjacent
+        suffixes sharing a prefix of n IDs is one repeated n-line sequence,
+        with the run length as its count, so all counts come from one
+        O(L log L) sort plus a linear scan per length.
+        Ranking: most repeats, then longest text, then longest sequence,
+        then earliest first occurrence.
+        """
         lines = [l.strip() for l in lyrics.split('\n') if l.strip() and not l.strip().startswith('[')]
         
         if len(lines) < min_lines:
             return []
         
-        sequences = []
+        line_ids = {}
+        ids = [line_ids.setdefault(line, len(line_ids)) for line in lines]
+        n = len(ids)
         
-        for seq_len in range(max_lines, min_lines - 1, -1):
-            for i in range(len(lines) - seq_len + 1):
-                sequence = tuple(lines[i:i + seq_len])
-                sequence_text = '\n'.join(sequence)
-                
-                count = 0
-                for j in range(len(lines) - seq_len + 1):
-                    check_seq = tuple(lines[j:j + seq_len])
-                    if sequence == check_seq:
-                        count += 1
-                
-                if count >= 2:
-                    sequences.append((sequence_text, count))
-        
-        if not sequences:
-            return []
+        suffixes = sorted(range(n), key=lambda i: ids[i:i + max_lines])
         
-        sequences.sort(key=lambda x: (x[1], len(x[0])), reverse=True)
+        lcp = [0] * n
+        for k in range(1, n):
+            a, b = suffixes[k - 1], suffixes[k]
+            limit = min(max_lines, n - a, n - b)
+            length = 0
+            while length < limit and ids[a + length] == ids[b + length]:
+                length += 1
+            lcp[k] = length
         
-        seen = set()
-        unique_sequences = []
-        for seq_text, count in sequences:
-            seq_lines = tuple(seq_text.split('\n'))
-            if seq_lines not in seen:
-                seen.add(seq_lines)
-                unique_sequences.append((seq_text, count))
+        candidates = []
+        for seq_len in range(max_lines, min_lines - 1, -1):
+            k = 1
+            while k < n:
+                if lcp[k] < seq_len:
+                    k += 1
+                    continue
+                run_start = k - 1
+                while k < n and lcp[k] >= seq_len:
+                    k += 1
+                first = min(suffixes[run_start:k])
+                count = k - run_start
+                text_len = sum(len(lines[i]) for i in range(first, first + seq_len)) + seq_len - 1
+                candidates.append((-count, -text_len, -seq_len, first))
         
-        return unique_sequences[:3]
+        top = heapq.nsmallest(3, candidates)
+        return [('\n'.join(lines[first:first - neg_len]), -neg_count)
+                for neg_count, _, neg_len, first in top]
     
-    def add_structure(self, lyrics: str, title: str, artist: str, retry_count=0) -> str:
+    def _build_prompt(self, lyrics: str, title: str, artist: str) -> str:
         choruses = self.detect_chorus_regex(lyrics)
         
         chorus_hint = ""
@@ -127,81 +245,75 @@ class LyricsModule:
             chorus_hint = f"\n\nDETECTED CHORUSES (use these for [chorus] sections):\n"
             for i, (chorus_text, count) in enumerate(choruses, 1):
                 chorus_hint += f"\nChorus {i} (repeats {count}x):\n{chorus_text}\n"
-
-        prompt = f"""Format these lyrics for AI choir music generation. CRITICAL RULES:
-
-CHOIR THEME: Emphasize group vocals, harmonies, and powerful collective singing
-
-STRUCTURE RULES:
-1. MUST START WITH: [verse] or [chorus] (NEVER [intro])
-2. ALLOWED TAGS: [verse], [chorus], [bridge], [inst-medium], [inst-long], [outro-short]
-3. NO [inst-short] allowed - only medium and long instrumentals
-4. ALWAYS end with [outro-short] (never medium or long outro)
-
-VERSE SPLITTING RULE:
-- IF a verse has MORE than 12 lines:
-  * Split at line 12
-  * Add " ; " on new line
-  * Add [inst-medium]
-  * Continue rest as [bridge]
-  * Add " ; " on new line
-  * Add [inst-medium] after bridge
-- IF we have say >2 chorus following each other:
-  * Add " ; " on new line
-  *  Add [inst-long] after odd numbers 1,3 etc
-  * Add next chorus on new line
-  
-  
-
-FORMATTING:
-1. Lyrics on separate lines AFTER the tag
-2. To add instrumental: end section with " ; " on new line, then instrumental tag
-3. NO numbers in tags
-4. Repeat [verse]/[chorus] for multiple sections{chorus_hint}
-
-Song: "{title}" by {artist}
-
-Lyrics:
-{lyrics}
-
-Output ONLY formatted lyrics. Remember: [outro-short] at the end, NO [inst-short]."""
-
-        try:
-            response = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=4000
-            )
-            
-            formatted = response.choices[0].message.content.strip()
-            
-            if not formatted.split('\n')[0].strip().startswith('['):
-                formatted = '[verse]\n' + formatted
-            
-            formatted = re.sub(r'\[intro[-\w]*\]', '', formatted, flags=re.IGNORECASE)
-            formatted = re.sub(r'\[inst-short\]', '[inst-medium]', formatted, flags=re.IGNORECASE)
-            formatted = re.sub(r'\[outro-(medium|long)\]', '[outro-short]', formatted, flags=re.IGNORECASE)
-            
-            if not re.search(r'\[outro-short\]', formatted, re.IGNORECASE):
-                formatted += '\n ; \n[outro-short]'
-            
-            formatted = re.sub(r'\n{3,}', '\n\n', formatted)
-            
-            return formatted.strip()
-        except Exception as e:
-            print(f"AI error: {e}")
-            
-            if retry_count < len(self.api_keys) - 1:
-                self._rotate_key()
-                return self.add_structure(lyrics, title, artist, retry_count + 1)
-            
-            return f"[verse]\n{lyrics}\n ; \n[outro-short]"
+        
+        return STRUCTURE_PROMPT.format(chorus_hint=chorus_hint, title=title, artist=artist, lyrics=lyrics)
     
-    def get_lyrics(self, title: str, artist: str, youtube_url: str = None, structured: bool = True) -> Optional[Dict[str, str]]:
-        print(f"🔍 Fetching '{title}' by {artist}...")
+    def _format_structured(self, content: str) -> str:
+        """Enforce the tag rules on the model output"""
+        formatted = content.strip()
+        
+        if not formatted.split('\n')[0].strip().startswith('['):
+            formatted = '[verse]\n' + formatted
         
-        result = self.fetch_raw_from_lrclib(title, artist)
+        formatted = re.sub(r'\[intro[-\w]*\]', '', formatted, flags=re.IGNORECASE)
+        formatted = re.sub(r'\[inst-short\]', '[inst-medium]', formatted, flags=re.IGNORECASE)
+        formatted = re.sub(r'\[outro-(medium|long)\]', '[outro-short]', formatted, flags=re.IGNORECASE)
+        
+        if not re.search(r'\[outro-short\]', formatted, re.IGNORECASE):
+            formatted += '\n ; \n[outro-short]'
+        
+        formatted = re.sub(r'\n{3,}', '\n\n', formatted)
+        return formatted.strip()
+    
+    def _cached_structure(self, prompt: str) -> Tuple[str, Optional[str]]:
+        cache_key = make_key(STRUCTURE_MODEL, STRUCTURE_TEMPERATURE, prompt)
+        if self.cache is None:
+            return cache_key, None
+        
+        cached = self.cache.get('structured', cache_key)
+        if cached is not None:
+            print("🗃️  Using cached structured lyrics")
+        return cache_key, cached
+    
+    def _store_structure(self, cache_key: str, formatted: str):
+        if self.cache is not None:
+            self.cache.set('structured', cache_key, formatted, ttl=STRUCTURED_TTL)
+    
+    def add_structure(self, lyrics: str, title: str, artist: str) -> str:
+        """Structured lyrics, or the plain lyrics as a single [verse] when Groq is unavailable"""
+        return self.structure_lyrics(lyrics, title, artist) or unstructured_lyrics(lyrics, title)
+    
+    def structure_lyrics(self, lyrics: str, title: str, artist: str) -> Optional[str]:
+        """
+        Structure lyrics with Groq. Calls go through the key pool, which
+        waits for budget when every key is at its limit; rate-limited calls
+        are requeued and a key that fails otherwise is not retried. Returns
+        None when no key is left, or the queue wait runs out.
+        """
+        prompt = self._build_prompt(lyrics, title, artist)
+        cache_key, cached = self._cached_structure(prompt)
+        if cached is not None:
+            return cached
+        
+        cost = estimate_tokens(prompt)
+        failed = set()
+        deadline = time.monotonic() + self.pool.max_queue_seconds
+        while True:
+            key = self.pool.acquire(cost, exclude=failed, timeout=deadline - time.monotonic())
+            if key is None:
+                break
+            try:
+                with span('llm_call', key=key.index, tokens=cost):
+                    raw = self._get_client(key).chat.completions.with_raw_response.create(**self._structure_request(prompt))
+                formatted = self._settle(key, raw, raw.parse(), cost)
+                self._store_structure(cache_key, formatted)
+                return formatted
+            except Exception as e:
+                if not self._record_failure(key, cost, e, title):
+                    failed.add(key.index)
+        return None
+    
+    def _build_output(self, result: Optional[Dict]) -> Optional[Dict]:
         if not result:
             print("❌ No lyrics found")
             return None
@@ -215,26 +327,185 @@ Output ONLY formatted lyrics. Remember: [outro-short] at the end, NO [inst-short
         print("🧹 Cleaning lyrics...")
         clean = self.clean_lyrics(lyrics_text)
         
-        output = {
+        return {
             'raw': result,
             'synced': result.get('synced_lyrics'),
             'plain': result.get('plain_lyrics'),
             'clean': clean,
             'structured': None,
+            'structure_fallback': False,
             'provider': result.get('provider', 'lrclib')
         }
+    
+    def _set_structure(self, output: Dict, structured: Optional[str], title: str):
+        output['structure_fallback'] = structured is None
+        output['structured'] = structured or unstructured_lyrics(output['clean'], title)
+    
+    def get_lyrics(self, title: str, artist: str, youtube_url: str = None, structured: bool = True) -> Optional[Dict[str, str]]:
+        print(f"🔍 Fetching '{title}' by {artist}...")
+        
+        output = self._build_output(self.fetch_raw_from_lrclib(title, artist))
+        if output is None:
+            return None
         
         if structured:
             print("🎶 Detecting chorus patterns...")
-            choruses = self.detect_chorus_regex(clean)
+            choruses = self.detect_chorus_regex(output['clean'])
             output['detected_choruses'] = choruses
             
             print("🤖 Adding structure tags...")
-            output['structured'] = self.add_structure(clean, title, artist)
+            self._set_structure(output, self.structure_lyrics(output['clean'], title, artist), title)
         
         return output
+    
+    async def _fetch_lrclib_async(self, http, title: str, artist: str) -> Optional[Dict]:
+        cache_key, cached = self._cached_lrclib(title, artist)
+        if cached is not None:
+            return cached or None
+        
+        try:
+            with span('lrclib', title=title):
+                response = await http.get("https://lrclib.net/api/search",
+                                          params={"track_name": title, "artist_name": artist})
+            if response.status_code == 200:
+                return self._store_lrclib(cache_key, response.json())
+        except Exception as e:
+            print(f"LRClib error for '{title}': {e}")
+        return None
+    
+    async def _structure_lyrics_async(self, clients: list, semaphore, lyrics: str, title: str, artist: str) -> Optional[str]:
+        """Async structure_lyrics; clients holds one AsyncGroq per pool key"""
+        prompt = self._build_prompt(lyrics, title, artist)
+        cache_key, cached = self._cached_structure(prompt)
+        if cached is not None:
+            return cached
+        
+        cost = estimate_tokens(prompt)
+        failed = set()
+        deadline = time.monotonic() + self.pool.max_queue_seconds
+        while True:
+            async with semaphore:
+                key = await self.pool.acquire_async(cost, exclude=failed, timeout=deadline - time.monotonic())
+                if key is None:
+                    break
+                try:
+                    with span('llm_call', title=title, key=key.index, tokens=cost):
+                        raw = await clients[key.index].chat.completions.with_raw_response.create(**self._structure_request(prompt))
+                    # AsyncAPIResponse.parse() is a coroutine
+                    formatted = self._settle(key, raw, await raw.parse(), cost)
+                    self._store_structure(cache_key, formatted)
+                    return formatted
+                except Exception as e:
+                    if not self._record_failure(key, cost, e, title):
+                        failed.add(key.index)
+        return None
+    
+    async def _get_lyrics_batch_async(self, tracks: List[Dict], artist: str, concurrency: int) -> List[Optional[Dict]]:
+        import httpx
+        from groq import AsyncGroq
+        
+        clients = [AsyncGroq(api_key=key.api_key) for key in self.pool.keys]
+        semaphore = asyncio.Semaphore(concurrency)
+        limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+        
+        try:
+            async with httpx.AsyncClient(timeout=30, limits=limits) as http:
+                raw_results = await asyncio.gather(*[
+                    self._fetch_lrclib_async(http, track['title'], track.get('artist', artist))
+                    for track in tracks
+                ])
+                
+                outputs = [self._build_output(result) for result in raw_results]
+                
+                async def structure(track, output):
+                    if output is None:
+                        return
+                    output['detected_choruses'] = self.detect_chorus_regex(output['clean'])
+                    structured = await self._structure_lyrics_async(
+                        clients, semaphore, output['clean'], track['title'], track.get('artist', artist)
+                    )
+                    self._set_structure(output, structured, track['title'])
+                
+                await asyncio.gather(*[
+                    structure(track, output)
+                    for track, output in zip(tracks, outputs)
+                ])
+        finally:
+            # Also when a task raises, so no AsyncGroq connection pool is left open
+            for client in clients:
+                await client.close()
+        
+        return outputs
+    
+    def get_lyrics_batch(self, tracks: List[Dict], artist: str, output_dir: str = 'lyrics', concurrency: int = 4) -> Dict[str, Optional[str]]:
+        """
+        Fetch and structure lyrics for many tracks at once.
+        
+        LRClib lookups all run concurrently over one pooled HTTP client and
+        Groq calls run up to `concurrency` at a time, each on whichever API
+        key the key pool finds has the most headroom. Each track's files are
+        written to output_dir/<track_id>/ and output_dir/index.json maps
+        track ids to those directories (None when no lyrics were found).
+        Returns that mapping.
+        """
+        print(f"🔍 Fetching lyrics for {len(tracks)} tracks (concurrency {concurrency})...")
+        outputs = asyncio.run(self._get_lyrics_batch_async(tracks, artist, concurrency))
+        
+        index_path = os.path.join(output_dir, 'index.json')
+        index = {}
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+        
+        for track, output in zip(tracks, outputs):
+            track_id = f"{track['position']}_{track['title']}"
+            if output is None:
+                print(f"  ✗ {track['position']}. {track['title']} - no lyrics")
+                index[track_id] = None
+                continue
+            
+            track_dir = os.path.join(output_dir, track_dir_name(track_id))
+            os.makedirs(track_dir, exist_ok=True)
+            save_lyrics(output, track['title'], track.get('artist', artist), track.get('youtube_url'),
+                        os.path.join(track_dir, LYRICS_FILE),
+                        os.path.join(track_dir, METADATA_FILE))
+            index[track_id] = track_dir
+            print(f"  ✓ {track['position']}. {track['title']}")
+        
+        os.makedirs(output_dir, exist_ok=True)
+        with open(index_path, 'w') as f:
+            json.dump(index, f, indent=2)
+        
+        return index
 
-if __name__ == "__main__":
+def track_dir_name(track_id: str) -> str:
+    """Filesystem-safe directory name for an album track id"""
+    return re.sub(r'[^\w.-]+', '_', track_id)
+
+def unstructured_lyrics(lyrics: str, title: str) -> str:
+    """Fallback when Groq can't structure the lyrics: all of them as a single [verse]"""
+    print(f"⚠️  No Groq key available for '{title}', using unstructured lyrics")
+    return f"[verse]\n{lyrics}\n ; \n[outro-short]"
+
+def save_lyrics(lyrics: Dict, title: str, artist: str, youtube_url: Optional[str],
+                lyrics_path: str = LYRICS_FILE, metadata_path: str = METADATA_FILE):
+    with open(lyrics_path, 'w') as f:
+        f.write(lyrics['structured'])
+    
+    metadata = {
+        'title': title,
+        'artist': artist,
+        'youtube_url': youtube_url,
+        'provider': lyrics['provider'],
+        'detected_choruses': lyrics.get('detected_choruses', []),
+        # Plain lyrics standing in for Groq's structure; never worth keeping as an artifact
+        'structure_fallback': lyrics.get('structure_fallback', False)
+    }
+    with open(metadata_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+def load_api_keys() -> List[str]:
+    """Groq keys from GROQ_API_KEYS (comma-separated) or GROQ_API_KEY"""
     api_keys_str = os.getenv("GROQ_API_KEYS", "")
     api_keys = [k.strip() for k in api_keys_str.split(',') if k.strip()]
     
@@ -242,18 +513,53 @@ if __name__ == "__main__":
         api_key = os.getenv("GROQ_API_KEY")
         if api_key:
             api_keys = [api_key]
-        else:
-            print("❌ GROQ_API_KEYS or GROQ_API_KEY not set")
-            sys.exit(1)
+    return api_keys
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch lyrics and add structure tags for song generation")
+    parser.add_argument('title', nargs='?')
+    parser.add_argument('artist', nargs='?')
+    parser.add_argument('youtube_url', nargs='?')
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the LRClib/Groq result cache")
+    parser.add_argument('--refresh', action='store_true', help="Ignore cached results but store fresh ones")
+    parser.add_argument('--album', help="Album JSON (from fetch_album.py) to fetch lyrics for in one batch")
+    parser.add_argument('--positions', help="Comma-separated track positions to fetch with --album (default: all)")
+    parser.add_argument('--output-dir', default='lyrics', help="Where --album writes per-track lyrics")
+    parser.add_argument('--concurrency', type=int, default=4, help="Concurrent Groq calls with --album")
+    parser.add_argument('--workspace', default='.', help="Directory to write the track's lyrics files into")
+    args = parser.parse_args()
+    
+    api_keys = load_api_keys()
+    if not api_keys:
+        print("❌ GROQ_API_KEYS or GROQ_API_KEY not set")
+        sys.exit(1)
     
     print(f"✓ Loaded {len(api_keys)} API key(s)")
     
-    module = LyricsModule(api_keys=api_keys)
+    cache = None if args.no_cache else DiskCache(refresh=args.refresh)
+    module = LyricsModule(api_keys=api_keys, cache=cache)
+    
+    if args.album:
+        with open(args.album, 'r', encoding='utf-8') as f:
+            album_data = json.load(f)
+        
+        tracks = album_data['tracks']
+        if args.positions:
+            wanted = set(args.positions.split(','))
+            tracks = [t for t in tracks if str(t['position']) in wanted]
+        
+        index = module.get_lyrics_batch(tracks, album_data['artist'], args.output_dir, args.concurrency)
+        found = sum(1 for t in tracks if index.get(f"{t['position']}_{t['title']}"))
+        print(f"\n✅ Lyrics for {found}/{len(tracks)} tracks saved under {args.output_dir}/")
+        if cache is not None:
+            print(f"🗃️  Cache: {cache.hits} hits, {cache.misses} misses")
+        module.pool.print_usage()
+        sys.exit(0 if found else 1)
     
-    if len(sys.argv) >= 3:
-        title = sys.argv[1]
-        artist = sys.argv[2]
-        youtube_url = sys.argv[3] if len(sys.argv) > 3 else None
+    if args.title and args.artist:
+        title = args.title
+        artist = args.artist
+        youtube_url = args.youtube_url
     elif os.path.exists('album_progress.json'):
         with open('album_progress.json', 'r') as f:
             progress = json.load(f)
@@ -271,18 +577,8 @@ if __name__ == "__main__":
     lyrics = module.get_lyrics(title=title, artist=artist, youtube_url=youtube_url, structured=True)
     
     if lyrics:
-        with open('structured_lyrics.txt', 'w') as f:
-            f.write(lyrics['structured'])
-        
-        metadata = {
-            'title': title,
-            'artist': artist,
-            'youtube_url': youtube_url,
-            'provider': lyrics['provider'],
-            'detected_choruses': lyrics.get('detected_choruses', [])
-        }
-        with open('lyrics_metadata.json', 'w') as f:
-            json.dump(metadata, f, indent=2)
+        workspace = TrackWorkspace(args.workspace)
+        save_lyrics(lyrics, title, artist, youtube_url, workspace.lyrics_path, workspace.metadata_path)
         
         print("\n" + "="*60)
         print(f"📝 Provider: {lyrics['provider']}")
@@ -291,11 +587,17 @@ if __name__ == "__main__":
         print("="*60)
         print(lyrics['structured'][:600])
         print("="*60)
-        print("\n✅ Saved to structured_lyrics.txt")
+        print(f"\n✅ Saved to {workspace.lyrics_path}")
         print("✅ Structure rules applied:")
         print("   - Only [inst-medium] and [inst-long] allowed")
         print("   - Always ends with [outro-short]")
         print("   - Long verses (>12 lines) split with bridge")
+        if cache is not None:
+            print(f"🗃️  Cache: {cache.hits} hits, {cache.misses} misses")
+        module.pool.print_usage()
     else:
         print("❌ Failed to fetch lyrics")
         sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,170 +1,194 @@
 import os
 import sys
 import json
-from gradio_client import Client
+import argparse
 import shutil
-import soundfile as sf
-from pydub import AudioSegment
-from pydub.playback import play
-import numpy as np
-from scipy import signal
-
-print("=" * 60)
-print("🎵 CHOIR SONG GENERATION STARTING")
-print("=" * 60)
-
-if not os.path.exists("structured_lyrics.txt"):
-    print("❌ Error: structured_lyrics.txt not found!")
-    print("Run fetch_lyrics.py first to generate lyrics.")
-    sys.exit(1)
-
-with open("structured_lyrics.txt", 'r', encoding='utf-8') as f:
-    lyrics = f.read()
-
-if not lyrics.strip():
-    print("❌ Error: structured_lyrics.txt is empty!")
-    sys.exit(1)
-
-if os.path.exists('lyrics_metadata.json'):
-    with open('lyrics_metadata.json', 'r') as f:
-        metadata = json.load(f)
-        title = metadata.get('title', 'Hey Jude')
-        artist = metadata.get('artist', 'The Beatles')
-        detected_choruses = metadata.get('detected_choruses', [])
-else:
-    title = os.getenv('SONG_TITLE', 'Hey Jude')
-    artist = os.getenv('SONG_ARTIST', 'The Beatles')
-    detected_choruses = []
-
-print(f"\n🎤 Song: '{title}' by {artist}")
-print("🎧 Style: Choir, Gospel, Harmonies")
-if detected_choruses:
-    print(f"🎵 Detected {len(detected_choruses)} chorus patterns")
-print("⏳ Connecting to AI music generator...\n")
-
-try:
-    client = Client("tencent/SongGeneration")
-    print("✓ Connected to Gradio API\n")
-except Exception as e:
-    print(f"❌ Error connecting to API: {e}")
-    sys.exit(1)
-
-print("⏳ Generating choir arrangement (this may take 2-5 minutes)...\n")
-
-try:
-    result = client.predict(
-        lyric=lyrics,
-        description=f"Choir, gospel, powerful harmonies, group vocals, uplifting, piano and organ, the bpm is 90, spiritual, anthemic, church choir",
-        prompt_audio=None,
-        genre="Auto",
-        cfg_coef=1.5,
-        temperature=0.8,
-        api_name="/generate_song"
-    )
-    print(result) 
-except Exception as e:
-    print(f"❌ Error generating song: {e}")
-    sys.exit(1)
-
-if isinstance(result, (list, tuple)) and len(result) >= 2:
-    audio_path = result[0]
-    gen_metadata = result[1] if isinstance(result[1], dict) else {}
-else:
-    audio_path = result if isinstance(result, str) else result[0]
-    gen_metadata = {}
-
-print("=" * 60)
-print("✅ CHOIR SONG GENERATED SUCCESSFULLY!")
-print("=" * 60)
-print(f"📁 Original file: {audio_path}")
-if gen_metadata and 'inference_duration' in gen_metadata:
-    print(f"⏱️  Generation time: {gen_metadata['inference_duration']:.1f}s")
-else:
-    print(f"⏱️  Generation complete")
-
-output_filename = f"{title.replace(' ', '_').lower()}_ai_cover.flac"
-choir_filename = f"{title.replace(' ', '_').lower()}_ai_cover_slowed.flac"
-
-print("\n🎛️  Applying choir enhancements...")
-print("   ├─ Slowing to 0.8x speed")
-print("   ├─ Adding smooth cathedral reverb")
-print("   ├─ Lowering pitch (-2 semitones)")
-print("   ├─ Applying warmth filter")
-print("   ├─ Dynamic compression")
-print("   └─ Smooth crossfading\n")
-
-try:
-    audio = AudioSegment.from_file(audio_path)
-    
-    # 1. SLOW DOWN TO 0.8x (smooth tempo reduction)
-    slowed_audio = audio._spawn(audio.raw_data, overrides={
-        "frame_rate": int(audio.frame_rate * 0.8)
-    })
-    slowed_audio = slowed_audio.set_frame_rate(audio.frame_rate)
-    
-    # 2. PITCH SHIFT DOWN (-2 semitones for choir warmth)
-    pitched_audio = slowed_audio._spawn(slowed_audio.raw_data, overrides={
-        "frame_rate": int(slowed_audio.frame_rate * 0.887)
-    })
-    pitched_audio = pitched_audio.set_frame_rate(slowed_audio.frame_rate)
-    
-    # 3. LOW-PASS FILTER (warmth without harshness)
-    samples = np.array(pitched_audio.get_array_of_samples())
-    
-    nyquist = pitched_audio.frame_rate / 2
-    cutoff = 8000
-    normalized_cutoff = cutoff / nyquist
-    
-    # Use butterworth filter for smooth frequency response
-    b, a = signal.butter(4, normalized_cutoff, btype='low')
-    filtered_samples = signal.filtfilt(b, a, samples)
-    
-    filtered_audio = pitched_audio._spawn(filtered_samples.astype(np.int16).tobytes())
-    
-    # Cathedral reverb (longer delay for choir effect)
-    echo_delay = 200
-    echo_decay = 0.4
-    reverb_audio = filtered_audio.overlay(
-        filtered_audio - (echo_decay * 10),
-        position=echo_delay
-    )
-    
-    reverb_audio = reverb_audio.overlay(
-        filtered_audio - (echo_decay * 15),
-        position=echo_delay * 2
-    )
-    
-    reverb_audio = reverb_audio.overlay(
-        filtered_audio - (echo_decay * 20),
-        position=echo_delay * 3
-    )
-    
-    final_audio = reverb_audio.normalize()
-    final_audio = final_audio - 2
-    
-    final_audio.export(choir_filename, format="flac")
-    shutil.copy(audio_path, output_filename)
-    
-except Exception as e:
-    print(f"❌ Error processing audio: {e}")
-    import traceback
-    traceback.print_exc()
-    sys.exit(1)
-
-print("=" * 60)
-print("✅ CHOIR PROCESSING COMPLETE!")
-print("=" * 60)
-print(f"📁 Original (1.0x): {output_filename}")
-print(f"📁 Choir Version: {choir_filename}")
-print(f"🎵 Duration: {len(final_audio) / 1000:.2f}s")
-print("\n🎛️  Effects applied:")
-print("   ✓ 0.8x speed (slowed)")
-print("   ✓ -2 semitones pitch")
-print("   ✓ Smooth cathedral reverb (4 layers)")
-print("   ✓ Warmth filter (5kHz)")
-print("   ✓ Dynamic compression (smooth)")
-print("   ✓ Crossfade smoothing")
-print("   ✓ NO vinyl crackle (removed)")
-print("=" * 60)
+from disk_cache import make_key
+from song_jobs import SongJobManager
+from telemetry import span
+from workspace import TrackWorkspace, song_filenames
+
+STREAMING_MIN_SECONDS = float(os.getenv('DSP_STREAMING_MIN_SECONDS', '600'))
+
+SONG_SPACE = "tencent/SongGeneration"
+SONG_DESCRIPTION = "Choir, gospel, powerful harmonies, group vocals, uplifting, piano and organ, the bpm is 90, spiritual, anthemic, church choir"
+SONG_OPTIONS = {
+    'description': SONG_DESCRIPTION,
+    'prompt_audio': None,
+    'genre': "Auto",
+    'cfg_coef': 1.5,
+    'temperature': 0.8
+}
+
+def song_request_key(lyrics):
+    """Artifact key of the raw song the Space generates for these lyrics"""
+    return make_key(SONG_SPACE, lyrics, json.dumps(SONG_OPTIONS, sort_keys=True))
+
+def choir_effects_key(raw_hash):
+    """Artifact key of the choir FLAC made from a raw song with the current effects chain"""
+    from choir_dsp import SLOWDOWN, PITCH_FACTOR, LOWPASS_HZ, ECHO_DELAY_MS, ECHO_DECAY, ECHO_TAPS, HEADROOM_DB
+    return make_key(raw_hash, SLOWDOWN, PITCH_FACTOR, LOWPASS_HZ, ECHO_DELAY_MS, ECHO_DECAY, ECHO_TAPS, HEADROOM_DB)
+
+def connect_song_client():
+    """Gradio client for the song generation Space; connect once and reuse it across tracks"""
+    from gradio_client import Client
+    return Client(SONG_SPACE)
+
+def process_choir_audio(audio_path, choir_path, streaming=None):
+    """
+    Apply the choir effects chain to a generated song, picking the
+    block-based engine for long songs (or when streaming=True).
+    Returns (frames written, sample rate).
+    """
+    import soundfile as sf
+    from choir_dsp import load_audio, apply_choir_effects, apply_choir_effects_streaming
+    
+    if streaming is None:
+        try:
+            streaming = sf.info(audio_path).duration >= STREAMING_MIN_SECONDS
+        except RuntimeError:
+            streaming = False
+    
+    with span('dsp', streaming=streaming) as event:
+        if streaming:
+            print("   (block-based engine)\n")
+            frames, sample_rate = apply_choir_effects_streaming(audio_path, choir_path)
+        else:
+            audio, sample_rate = load_audio(audio_path)
+            final_audio = apply_choir_effects(audio, sample_rate)
+            del audio
+            
+            sf.write(choir_path, final_audio, sample_rate, subtype='PCM_16')
+            frames = len(final_audio)
+        event['audio_s'] = frames / sample_rate
+    return frames, sample_rate
+
+def song_job_manager(client, **options):
+    """SongJobManager submitting /generate_song jobs with SONG_OPTIONS; options override its limits"""
+    return SongJobManager(client, submit_kwargs=dict(SONG_OPTIONS, api_name="/generate_song"), **options)
+
+def request_song(client, lyrics, jobs=None, name='song'):
+    """
+    Generate the raw song on the Space; returns the path of the downloaded audio.
+    Pass a shared SongJobManager as jobs to bound remote jobs across tracks.
+    """
+    if not lyrics.strip():
+        raise ValueError("structured lyrics are empty")
+    
+    print("⏳ Generating choir arrangement (this may take 2-5 minutes)...\n")
+    with span('predict', song=name):
+        audio_path = (jobs or song_job_manager(client)).generate(lyrics, name)
+    
+    print("=" * 60)
+    print("✅ CHOIR SONG GENERATED SUCCESSFULLY!")
+    print("=" * 60)
+    print(f"📁 Original file: {audio_path}")
+    return audio_path
+
+def generate_song(client, lyrics, title, output_dir='.', streaming=None, audio_path=None):
+    """
+    Generate the choir song for structured lyrics and write the original and
+    slowed choir FLACs into output_dir. With audio_path, that already
+    generated song is used instead of calling the Space.
+    Returns {'original': path, 'choir': path, 'duration': seconds}.
+    """
+    if audio_path is None:
+        audio_path = request_song(client, lyrics)
+    
+    output_name, choir_name = song_filenames(title)
+    output_filename = os.path.join(output_dir, output_name)
+    choir_filename = os.path.join(output_dir, choir_name)
+    
+    print("\n🎛️  Applying choir enhancements...")
+    print("   ├─ Slowing to 0.8x speed")
+    print("   ├─ Adding smooth cathedral reverb")
+    print("   ├─ Lowering pitch (-2 semitones)")
+    print("   ├─ Applying warmth filter")
+    print("   ├─ Dynamic compression")
+    print("   └─ Smooth crossfading\n")
+    
+    n_frames, sample_rate = process_choir_audio(audio_path, choir_filename, streaming)
+    if os.path.abspath(audio_path) != os.path.abspath(output_filename):
+        shutil.copy(audio_path, output_filename)
+    
+    return {
+        'original': output_filename,
+        'choir': choir_filename,
+        'duration': n_frames / sample_rate
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the choir song for the structured lyrics")
+    parser.add_argument('--streaming', action='store_true', help="Force the block-based effects engine")
+    parser.add_argument('--workspace', default='.', help="Track directory holding the lyrics; the songs are written there")
+    parser.add_argument('--raw-audio', help="Apply the effects to this already generated song instead of calling the Space")
+    args = parser.parse_args()
+    workspace = TrackWorkspace(args.workspace)
+    
+    print("=" * 60)
+    print("🎵 CHOIR SONG GENERATION STARTING")
+    print("=" * 60)
+    
+    if not os.path.exists(workspace.lyrics_path):
+        print(f"❌ Error: {workspace.lyrics_path} not found!")
+        print("Run fetch_lyrics.py first to generate lyrics.")
+        sys.exit(1)
+    
+    with open(workspace.lyrics_path, 'r', encoding='utf-8') as f:
+        lyrics = f.read()
+    
+    if not lyrics.strip():
+        print(f"❌ Error: {workspace.lyrics_path} is empty!")
+        sys.exit(1)
+    
+    metadata = workspace.load_metadata()
+    title = metadata['title']
+    artist = metadata['artist']
+    detected_choruses = metadata['detected_choruses']
+    
+    print(f"\n🎤 Song: '{title}' by {artist}")
+    print("🎧 Style: Choir, Gospel, Harmonies")
+    if detected_choruses:
+        print(f"🎵 Detected {len(detected_choruses)} chorus patterns")
+    
+    client = None
+    if args.raw_audio:
+        print(f"♻️  Reusing generated song: {args.raw_audio}\n")
+    else:
+        print("⏳ Connecting to AI music generator...\n")
+        try:
+            client = connect_song_client()
+            print("✓ Connected to Gradio API\n")
+        except Exception as e:
+            print(f"❌ Error connecting to API: {e}")
+            sys.exit(1)
+    
+    try:
+        song = generate_song(client, lyrics, title, workspace.root, streaming=True if args.streaming else None,
+                             audio_path=args.raw_audio)
+    except Exception as e:
+        print(f"❌ Error generating song: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    
+    print("=" * 60)
+    print("✅ CHOIR PROCESSING COMPLETE!")
+    print("=" * 60)
+    print(f"📁 Original (1.0x): {song['original']}")
+    print(f"📁 Choir Version: {song['choir']}")
+    print(f"🎵 Duration: {song['duration']:.2f}s")
+    print("\n🎛️  Effects applied:")
+    print("   ✓ 0.8x speed (slowed)")
+    print("   ✓ -2 semitones pitch")
+    print("   ✓ Smooth cathedral reverb (4 layers)")
+    print("   ✓ Warmth filter (5kHz)")
+    print("   ✓ Dynamic compression (smooth)")
+    print("   ✓ Crossfade smoothing")
+    print("   ✓ NO vinyl crackle (removed)")
+    print("=" * 60)
+    
+    print("\n✅ Files saved! Run create_video.py next to make the music video.")
 
-print("\n✅ Files saved! Run create_video.py next to make the music video.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+import os
+import json
+import hashlib
+import time
+import random
+import struct
+import shutil
+import zipfile
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: the index is only guarded between threads
+    fcntl = None
+
+FFMPEG = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+CACHE_DIR = os.getenv('GIF_CACHE_DIR', os.path.join('data', 'gif_cache'))
+CACHE_MAX_MB = int(os.getenv('GIF_CACHE_MAX_MB', '4096'))
+# GIFs ffmpeg rejected are skipped for this long, or until ffmpeg changes
+FAILED_TTL_HOURS = float(os.getenv('GIF_CACHE_FAILED_TTL_HOURS', '168'))
+# swscale kernel for the aspect-fill scale: bicubic (ffmpeg's default), bilinear, lanczos, area...
+DEFAULT_SCALE_FLAGS = 'bicubic'
+SCALE_FLAGS = os.getenv('GIF_SCALE_FLAGS', DEFAULT_SCALE_FLAGS)
+
+# ffmpeg's GIF demuxer replaces frame delays below 2cs with 10cs
+GIF_MIN_DELAY = 2
+GIF_DEFAULT_DELAY = 10
+
+_ffmpeg_version = None
+
+def ffmpeg_version():
+    """First line of `ffmpeg -version`, or None when ffmpeg cannot be run"""
+    global _ffmpeg_version
+    if _ffmpeg_version is None:
+        try:
+            result = subprocess.run([FFMPEG, '-version'], capture_output=True, text=True, check=True)
+            _ffmpeg_version = result.stdout.split('\n', 1)[0]
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return _ffmpeg_version
+
+def list_gif_members(zip_path):
+    """List GIF members of the zip, skipping macOS resource forks"""
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        return [
+            info.filename for info in zip_ref.infolist()
+            if info.filename.lower().endswith('.gif')
+            and not info.filename.startswith('__MACOSX/')
+            and not os.path.basename(info.filename).startswith('._')
+        ]
+
+def _skip_sub_blocks(data, pos):
+    while True:
+        size = data[pos]
+        pos += 1
+        if size == 0:
+            return pos
+        pos += size
+
+def read_gif_timing(data):
+    """
+    Read size, frame count and duration of a GIF from its block headers.
+    Image data is skipped without LZW decoding.
+    """
+    if data[:6] not in (b'GIF87a', b'GIF89a'):
+        raise ValueError("not a GIF file")
+
+    width, height = struct.unpack('<HH', data[6:10])
+    flags = data[10]
+    pos = 13
+    if flags & 0x80:
+        pos += 3 * (2 << (flags & 0x07))
+
+    frames = 0
+    total_delay = 0
+    delay = 0
+    while pos < len(data):
+        block = data[pos]
+        pos += 1
+
+        if block == 0x3B:  # trailer
+            break
+        elif block == 0x21:  # extension
+            label = data[pos]
+            pos += 1
+            if label == 0xF9 and data[pos] >= 4:  # graphic control
+                delay = struct.unpack('<H', data[pos + 2:pos + 4])[0]
+            pos = _skip_sub_blocks(data, pos)
+        elif block == 0x2C:  # image descriptor
+            flags = data[pos + 8]
+            pos += 9
+            if flags & 0x80:
+                pos += 3 * (2 << (flags & 0x07))
+            pos = _skip_sub_blocks(data, pos + 1)
+            frames += 1
+            total_delay += delay if delay >= GIF_MIN_DELAY else GIF_DEFAULT_DELAY
+        else:
+            break
+
+    if frames == 0:
+        raise ValueError("GIF has no frames")
+
+    return {
+        'width': width,
+        'height': height,
+        'frames': frames,
+        'duration': total_delay / 100
+    }
+
+class GifIndex:
+    """
+    Header metadata for every GIF in a zip, built once per zip.
+
+    Metadata is stored by member CRC in gif_meta.json next to the clip
+    cache, so a re-packed zip only parses the GIFs it has not seen yet and
+    an unchanged zip is not opened at all.
+    """
+
+    def __init__(self, zip_path, cache_dir=CACHE_DIR):
+        self.zip_path = zip_path
+        self.index_path = os.path.join(cache_dir, 'gif_meta.json')
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.data = {'zips': {}, 'gifs': {}}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                print("  ⚠ GIF metadata index unreadable, rebuilding")
+
+        stat = os.stat(zip_path)
+        signature = f"{stat.st_size}:{int(stat.st_mtime)}"
+        zip_key = os.path.abspath(zip_path)
+        known = self.data['zips'].get(zip_key)
+
+        if known and known['signature'] == signature:
+            self.members = known['members']
+        else:
+            self.members = self._build(signature, zip_key)
+
+    def _build(self, signature, zip_key):
+        print("🗂️  Indexing GIF headers...")
+        members = {}
+        gifs = self.data['gifs']
+        with zipfile.ZipFile(self.zip_path, 'r') as zip_ref:
+            for member in list_gif_members(self.zip_path):
+                crc = f"{zip_ref.getinfo(member).CRC:08x}"
+                members[member] = crc
+                if crc in gifs:
+                    continue
+                try:
+                    gifs[crc] = read_gif_timing(zip_ref.read(member))
+                except (ValueError, IndexError, struct.error) as e:
+                    print(f"  ⚠ Unreadable GIF header {os.path.basename(member)}: {e}")
+                    gifs[crc] = None
+
+        self.data['zips'][zip_key] = {'signature': signature, 'members': members}
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.index_path)
+        return members
+
+    def digest(self):
+        """Hash of the collection's member names and CRCs; changes whenever a GIF is added, removed or replaced"""
+        return hashlib.sha256(json.dumps(sorted(self.members.items())).encode('utf-8')).hexdigest()
+
+    def gif_files(self):
+        """Members whose headers could be read"""
+        return [m for m, crc in self.members.items() if self.data['gifs'].get(crc)]
+
+    def info(self, member):
+        return self.data['gifs'].get(self.members.get(member))
+
+    def duration(self, member):
+        info = self.info(member)
+        return info['duration'] if info else None
+
+def plan_gif_timeline(gif_files, durations, target_duration, rng=random):
+    """
+    Pick GIFs in random order without repeating until all are used, then
+    reshuffle, until their durations cover target_duration.
+    Returns ([(gif_file, used_seconds), ...], rounds); the last clip's used
+    span is trimmed to end exactly at target_duration.
+    """
+    playable = [g for g in gif_files if durations.get(g)]
+    if not playable or target_duration <= 0:
+        return [], 0
+
+    plan = []
+    total_duration = 0
+    available_gifs = []
+    rounds = -1
+
+    while total_duration < target_duration:
+        if not available_gifs:
+            rounds += 1
+            available_gifs = playable.copy()
+            rng.shuffle(available_gifs)
+
+        gif_file = available_gifs.pop(0)
+        remaining = target_duration - total_duration
+        span = min(durations[gif_file], remaining)
+        plan.append((gif_file, span))
+        total_duration += span
+        if span == remaining:
+            break
+
+    return plan, rounds
+
+def fill_crop_filter(width, height, fps=None, flags=SCALE_FLAGS):
+    """ffmpeg filter graph: constant fps (when given), aspect-fill scale with the flags kernel, center crop"""
+    return (
+        (f"fps={fps}," if fps else "") +
+        f"scale={width}:{height}:force_original_aspect_ratio=increase:flags={flags},"
+        f"crop={width}:{height},setsar=1"
+    )
+
+class GifCache:
+    """
+    Content-addressed cache of GIFs transcoded once to target-resolution MP4s.
+
+    Entries are keyed by the zip member's CRC plus the target size, fps and
+    scale kernel, so the same GIF is shared across zips and re-used across
+    runs. An index.json in the cache directory records size and last use of
+    every entry; the least recently used ones are evicted once the cache
+    grows past max_bytes. get() may be called from several threads, and
+    several processes may share the directory: every index update re-reads
+    index.json under a file lock and merges into it, hits bump the MP4's
+    mtime, and eviction adopts MP4s missing from the index so the cap
+    still holds.
+
+    A GIF ffmpeg rejects is recorded with the ffmpeg version and skipped
+    until that changes or FAILED_TTL_HOURS pass. Environment errors
+    (ffmpeg missing, disk full) are raised and never recorded.
+    """
+
+    def __init__(self, zip_path, width, height, fps=24, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024,
+                 flags=SCALE_FLAGS):
+        self.zip_path = zip_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.flags = flags
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.lock_path = os.path.join(cache_dir, 'index.lock')
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._zip = zipfile.ZipFile(zip_path, 'r')
+        self._pinned = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load_index()
+
+    def _load_index(self):
+        self.index = {'entries': {}, 'failed': {}}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError):
+                print("  ⚠ GIF cache index unreadable, starting fresh")
+
+        # Drop entries whose files were removed behind our back
+        entries = self.index['entries']
+        for key in [k for k, e in entries.items()
+                    if not os.path.exists(os.path.join(self.cache_dir, e['file']))]:
+            del entries[key]
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    @contextmanager
+    def _index_locked(self):
+        """Hold index.json against other processes: reload it, let the caller update it, save it"""
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._load_index()
+                yield self.index
+                self._save_index()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def key(self, member):
+        crc = self._zip.getinfo(member).CRC
+        # Entries made with the default kernel keep their pre-GIF_SCALE_FLAGS keys
+        kernel = '' if self.flags == DEFAULT_SCALE_FLAGS else f"_{self.flags}"
+        return f"{crc:08x}_{self.width}x{self.height}_{self.fps}{kernel}"
+
+    def get(self, member):
+        """Return the path of the normalized MP4 for a zip member, transcoding on a miss"""
+        with self._lock:
+            return self._get(member)
+    
+    def _failed(self, key):
+        failure = self.index['failed'].get(key)
+        if failure is None:
+            return False
+        # Entries from before failures were versioned are retried once
+        if (isinstance(failure, dict) and failure.get('ffmpeg') == ffmpeg_version()
+                and time.time() - failure.get('time', 0) < FAILED_TTL_HOURS * 3600):
+            return True
+        del self.index['failed'][key]
+        return False
+
+    def _hit(self, key):
+        self.hits += 1
+        self._pinned.add(key)
+        path = os.path.join(self.cache_dir, self.index['entries'][key]['file'])
+        # A hit only bumps the file's mtime, which eviction reads as its last use
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def _get(self, member):
+        key = self.key(member)
+        if self._failed(key):
+            return None
+
+        entry = self.index['entries'].get(key)
+        if entry is not None and os.path.exists(os.path.join(self.cache_dir, entry['file'])):
+            return self._hit(key)
+
+        # Another process may have transcoded it, or given up on it, since we last read the index
+        with self._index_locked():
+            if self._failed(key):
+                return None
+            if key in self.index['entries']:
+                return self._hit(key)
+
+        self.misses += 1
+        entry = self._transcode(member, key)
+        with self._index_locked():
+            if entry is None:
+                self.index['failed'][key] = {'source': member, 'ffmpeg': ffmpeg_version(), 'time': time.time()}
+                return None
+            self.index['entries'][key] = entry
+            self._pinned.add(key)
+            self._evict()
+        return os.path.join(self.cache_dir, entry['file'])
+
+    def _transcode(self, member, key):
+        """Cache entry for member, or None when ffmpeg rejects the GIF; OSError propagates"""
+        filename = f"{key}.mp4"
+        output_path = os.path.join(self.cache_dir, filename)
+
+        # Inside the cache directory, so the finished file is renamed into place atomically
+        temp_dir = tempfile.mkdtemp(prefix='.gif_cache_', dir=self.cache_dir)
+        try:
+            gif_path = os.path.join(temp_dir, 'source.gif')
+            with self._zip.open(member) as src, open(gif_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+
+            partial_path = os.path.join(temp_dir, filename)
+            subprocess.run([
+                FFMPEG, '-y', '-v', 'error',
+                '-i', gif_path,
+                '-vf', fill_crop_filter(self.width, self.height, self.fps, self.flags),
+                '-an',
+                '-c:v', 'libx264',
+                '-preset', 'veryfast',
+                '-crf', '18',
+                '-pix_fmt', 'yuv420p',
+                '-movflags', '+faststart',
+                partial_path
+            ], check=True, capture_output=True, text=True)
+            shutil.move(partial_path, output_path)
+        except subprocess.CalledProcessError as e:
+            print(f"  ⚠ Error normalizing {os.path.basename(member)}: {e} {(e.stderr or '').strip()}")
+            return None
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        return {
+            'file': filename,
+            'source': member,
+            'bytes': os.path.getsize(output_path),
+            'last_used': time.time()
+        }
+
+    def _evict(self):
+        entries = self.index['entries']
+        # Hits in any process show up as mtimes; MP4s missing from the index still count
+        by_file = {e['file']: e for e in entries.values()}
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.mp4'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, filename))
+            except OSError:
+                continue
+            entry = by_file.get(filename)
+            if entry is None:
+                entries[filename[:-len('.mp4')]] = {
+                    'file': filename, 'source': None, 'bytes': stat.st_size, 'last_used': stat.st_mtime
+                }
+            else:
+                entry['last_used'] = max(entry['last_used'], stat.st_mtime)
+
+        total = sum(e['bytes'] for e in entries.values())
+        if total <= self.max_bytes:
+            return
+
+        # Never evict clips handed out in this run; they may still be opened
+        for key in sorted(entries, key=lambda k: entries[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if key in self._pinned:
+                continue
+            entry = entries.pop(key)
+            try:
+                os.remove(os.path.join(self.cache_dir, entry['file']))
+            except OSError:
+                pass
+            total -= entry['bytes']
+
+    def close(self):
+        with self._lock:
+            self._zip.close()
@@ -0,0 +1,46 @@
+import subprocess
+from moviepy import VideoClip, VideoFileClip
+from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+from gif_assets import FFMPEG, SCALE_FLAGS, fill_crop_filter
+
+class FillCropReader(FFMPEG_VideoReader):
+    """
+    FFMPEG_VideoReader that runs the aspect-fill scale and center crop in
+    ffmpeg's filter graph, so frames leave the decoder at width x height
+    instead of being decoded full-size and resized per frame in Python.
+    flags picks the swscale kernel (bicubic, bilinear, lanczos...).
+    """
+    
+    def __init__(self, filename, width, height, flags=SCALE_FLAGS):
+        self.filter_graph = fill_crop_filter(width, height, flags=flags)
+        super().__init__(filename, target_resolution=(width, height), resize_algo=flags)
+    
+    def initialize(self, start_time=0):
+        """Open the pipe at start_time, pre-reading that frame (see FFMPEG_VideoReader.initialize)"""
+        self.close(delete_lastread=False)
+        self.pos = self.get_frame_number(start_time)
+        # Seeking to a frame's exact timestamp would skip it; GIFs are short, so seek after -i
+        seek = ['-ss', f"{self.pos / self.fps - 0.00001:.6f}"] if self.pos else []
+        self.proc = subprocess.Popen([
+            FFMPEG, '-v', 'error',
+            '-i', self.filename, *seek,
+            '-vf', self.filter_graph,
+            '-f', 'image2pipe',
+            '-pix_fmt', self.pixel_format,
+            '-vcodec', 'rawvideo',
+            '-'
+        ], bufsize=self.bufsize, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.last_read = self.read_frame()
+
+class GifClip(VideoFileClip):
+    """VideoFileClip reading through a FillCropReader, already at the target size"""
+    
+    def __init__(self, filename, width, height, flags=SCALE_FLAGS):
+        VideoClip.__init__(self)
+        self.reader = FillCropReader(filename, width, height, flags)
+        self.duration = self.end = self.reader.duration
+        self.fps = self.reader.fps
+        self.size = self.reader.size
+        self.rotation = self.reader.rotation
+        self.filename = filename
+        self.frame_function = lambda t: self.reader.get_frame(t)
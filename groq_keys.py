@@ -0,0 +1,218 @@
+import os
+import re
+import time
+import asyncio
+import threading
+from typing import Optional, List, Dict
+
+# Per-key limits for the structuring model; Groq's response headers take
+# over as soon as a key has answered once
+GROQ_RPM = int(os.getenv('GROQ_RPM', '30'))
+GROQ_TPM = int(os.getenv('GROQ_TPM', '12000'))
+GROQ_MAX_QUEUE_SECONDS = float(os.getenv('GROQ_MAX_QUEUE_SECONDS', '600'))
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Groq reset header such as '7.66s', '2m59.56s' or '120ms'"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if not parts:
+        return None
+    scale = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+def estimate_tokens(prompt: str) -> int:
+    """Rough cost of a structuring call: the prompt plus a reply of similar length"""
+    return 2 * (len(prompt) // 4 + 1)
+
+class TokenBucket:
+    """Budget that refills continuously to `capacity` over `period` seconds"""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # A request bigger than the whole bucket only has to wait for a full one
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def sync(self, remaining: float, now: float):
+        """Adopt the server's view of what is left"""
+        self.level = min(self.capacity, remaining)
+        self.updated = now
+
+class KeyState:
+    def __init__(self, index: int, api_key: str, rpm: int, tpm: int):
+        self.index = index
+        self.api_key = api_key
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self.disabled = False
+
+        self.calls = 0
+        self.tokens_used = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.waited = 0.0
+
+    @property
+    def label(self) -> str:
+        return f"key {self.index + 1} (…{self.api_key[-4:]})"
+
+    def headroom(self) -> float:
+        return min(self.requests.level / self.requests.capacity,
+                   self.tokens.level / self.tokens.capacity)
+
+    def wait_time(self, cost: int, now: float) -> float:
+        return max(self.blocked_until - now,
+                   self.requests.wait_time(1),
+                   self.tokens.wait_time(cost))
+
+class KeyPool:
+    """
+    Schedules Groq calls over several API keys.
+
+    Every key has a request bucket and a token bucket, seeded from the
+    configured per-minute limits and corrected from Groq's x-ratelimit
+    headers after each response. A call goes to the key with the most
+    headroom that can afford it right now; when no key can, the caller
+    waits for the first one to refill instead of spending a round trip on
+    a 429. Works from threads (acquire) and from asyncio (acquire_async).
+    """
+
+    def __init__(self, api_keys: List[str], rpm: int = GROQ_RPM, tpm: int = GROQ_TPM,
+                 max_queue_seconds: float = GROQ_MAX_QUEUE_SECONDS):
+        self.keys = [KeyState(i, key, rpm, tpm) for i, key in enumerate(api_keys)]
+        self.max_queue_seconds = max_queue_seconds
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, cost: int, exclude=()):
+        """Reserve budget on the best key; returns (key, 0) or (None, seconds to wait)"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [k for k in self.keys if not k.disabled and k.index not in exclude]
+            if not candidates:
+                return None, None
+
+            for key in candidates:
+                key.requests.refill(now)
+                key.tokens.refill(now)
+
+            ready = [k for k in candidates if k.wait_time(cost, now) <= 0]
+            if not ready:
+                return None, min(k.wait_time(cost, now) for k in candidates)
+
+            key = max(ready, key=lambda k: k.headroom())
+            key.requests.level -= 1
+            key.tokens.level -= cost
+            key.calls += 1
+            return key, 0.0
+
+    def acquire(self, cost: int, exclude=(), timeout: float = None) -> Optional[KeyState]:
+        """Block until a key can take a call of `cost` tokens; None if none is usable in time"""
+        timeout = self.max_queue_seconds if timeout is None else timeout
+        waited = 0.0
+        while True:
+            key, wait = self._try_acquire(cost, exclude)
+            if key is not None:
+                key.waited += waited
+                return key
+            if wait is None or waited + wait > timeout:
+                return None
+            if waited == 0.0:
+                print(f"⏳ All Groq keys at their limits, queueing for {wait:.1f}s")
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, cost: int, exclude=(), timeout: float = None) -> Optional[KeyState]:
+        timeout = self.max_queue_seconds if timeout is None else timeout
+        waited = 0.0
+        while True:
+            key, wait = self._try_acquire(cost, exclude)
+            if key is not None:
+                key.waited += waited
+                return key
+            if wait is None or waited + wait > timeout:
+                return None
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def record_response(self, key: KeyState, headers, cost: int, used_tokens: Optional[int]):
+        """Settle a finished call: actual token usage and the server's remaining budgets"""
+        now = time.monotonic()
+        with self._lock:
+            if used_tokens is not None:
+                key.tokens_used += used_tokens
+                key.tokens.level += cost - used_tokens
+            self._sync_headers(key, headers, now)
+
+    def record_rate_limit(self, key: KeyState, headers):
+        """Park a key after a 429 until Groq says it may be used again"""
+        now = time.monotonic()
+        with self._lock:
+            key.rate_limited += 1
+            self._sync_headers(key, headers, now)
+            retry_after = parse_reset(headers.get('retry-after')) if headers else None
+            key.blocked_until = now + (retry_after if retry_after is not None else 60.0 / key.requests.capacity)
+
+    def record_error(self, key: KeyState, cost: int, fatal: bool = False):
+        """Count a failed call; fatal errors (bad key, no access) take the key out of the pool"""
+        with self._lock:
+            key.errors += 1
+            key.requests.level += 1
+            key.tokens.level += cost
+            if fatal:
+                key.disabled = True
+
+    def _sync_headers(self, key: KeyState, headers, now: float):
+        if not headers:
+            return
+
+        remaining_tokens = headers.get('x-ratelimit-remaining-tokens')
+        if remaining_tokens is not None:
+            limit_tokens = headers.get('x-ratelimit-limit-tokens')
+            if limit_tokens is not None and float(limit_tokens) != key.tokens.capacity:
+                key.tokens = TokenBucket(float(limit_tokens))
+            key.tokens.sync(float(remaining_tokens), now)
+
+        # The request headers describe a daily quota: only act on it once it runs out
+        remaining_requests = headers.get('x-ratelimit-remaining-requests')
+        if remaining_requests is not None and float(remaining_requests) <= 0:
+            reset = parse_reset(headers.get('x-ratelimit-reset-requests'))
+            if reset:
+                key.blocked_until = max(key.blocked_until, now + reset)
+
+    def usage(self) -> List[Dict]:
+        """Per-key counters for logging"""
+        with self._lock:
+            return [{
+                'key': k.label,
+                'calls': k.calls,
+                'tokens': k.tokens_used,
+                'rate_limited': k.rate_limited,
+                'errors': k.errors,
+                'queued_seconds': round(k.waited, 2),
+                'disabled': k.disabled
+            } for k in self.keys]
+
+    def print_usage(self):
+        for u in self.usage():
+            status = " (disabled)" if u['disabled'] else ""
+            print(f"🔑 {u['key']}: {u['calls']} calls, {u['tokens']} tokens, "
+                  f"{u['rate_limited']} rate-limited, {u['errors']} errors, "
+                  f"queued {u['queued_seconds']}s{status}")
@@ -1,8 +1,144 @@
 import json
 import os
-from moviepy import VideoFileClip, concatenate_videoclips
+import argparse
+import shutil
+import subprocess
+import tempfile
+from collections import Counter
 
-def merge_album_videos(progress_file='album_progress.json', output_dir='outputs'):
+FFMPEG = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+FFPROBE = os.getenv('FFPROBE_BINARY', 'ffprobe')
+
+def probe_video(video_path):
+    """Read codec, resolution, fps and audio parameters from the container header"""
+    result = subprocess.run([
+        FFPROBE, '-v', 'error',
+        '-show_entries',
+        'stream=codec_type,codec_name,profile,pix_fmt,width,height,r_frame_rate,time_base,sample_rate,channels'
+        ':format=duration',
+        '-of', 'json',
+        video_path
+    ], check=True, capture_output=True, text=True)
+    info = json.loads(result.stdout)
+
+    video = next((s for s in info.get('streams', []) if s.get('codec_type') == 'video'), {})
+    audio = next((s for s in info.get('streams', []) if s.get('codec_type') == 'audio'), {})
+
+    return {
+        'signature': (
+            video.get('codec_name'), video.get('profile'), video.get('pix_fmt'),
+            video.get('width'), video.get('height'),
+            video.get('r_frame_rate'), video.get('time_base'),
+            audio.get('codec_name'), audio.get('sample_rate'), audio.get('channels')
+        ),
+        'video': video,
+        'audio': audio,
+        'duration': float(info.get('format', {}).get('duration') or 0)
+    }
+
+def normalize_video(video_path, reference, output_path):
+    """Re-encode one track so its streams match the reference track"""
+    video = reference['video']
+    audio = reference['audio']
+    width, height = video['width'], video['height']
+    timescale = video['time_base'].split('/')[-1]
+
+    cmd = [
+        FFMPEG, '-y', '-v', 'error',
+        '-i', video_path,
+        '-vf', f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},setsar=1",
+        '-r', video['r_frame_rate'],
+        '-c:v', video['codec_name'],
+        '-pix_fmt', video['pix_fmt'],
+        '-video_track_timescale', timescale,
+    ]
+    if audio:
+        cmd += [
+            '-c:a', audio['codec_name'],
+            '-ar', str(audio['sample_rate']),
+            '-ac', str(audio['channels']),
+        ]
+    else:
+        cmd += ['-an']
+    cmd.append(output_path)
+
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+def concat_stream_copy(video_paths, output_path):
+    """Join videos with identical stream parameters via the concat demuxer (no decoding)"""
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        for path in video_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+        list_path = f.name
+
+    try:
+        subprocess.run([
+            FFMPEG, '-y', '-v', 'error',
+            '-f', 'concat', '-safe', '0',
+            '-i', list_path,
+            '-c', 'copy',
+            '-movflags', '+faststart',
+            output_path
+        ], check=True, capture_output=True, text=True)
+    finally:
+        os.remove(list_path)
+
+def merge_stream_copy(video_paths, output_path):
+    """
+    Remux tracks into one file. Tracks whose streams differ from the
+    majority are re-encoded to match first; the rest are copied as-is.
+    Returns the total duration in seconds.
+    """
+    probes = [probe_video(path) for path in video_paths]
+    reference_signature, _ = Counter(p['signature'] for p in probes).most_common(1)[0]
+    reference = next(p for p in probes if p['signature'] == reference_signature)
+
+    temp_dir = tempfile.mkdtemp(prefix='album_merge_')
+    try:
+        concat_paths = []
+        reencoded = 0
+        for i, (path, probe) in enumerate(zip(video_paths, probes)):
+            if probe['signature'] == reference_signature:
+                concat_paths.append(path)
+            else:
+                print(f"  ⚙️  Re-encoding mismatched track: {os.path.basename(path)}")
+                normalized_path = os.path.join(temp_dir, f'{i:03d}.mp4')
+                normalize_video(path, reference, normalized_path)
+                concat_paths.append(normalized_path)
+                reencoded += 1
+
+        copied = len(video_paths) - reencoded
+        print(f"  ✓ Stream-copying {copied}/{len(video_paths)} tracks without re-encoding")
+        concat_stream_copy(concat_paths, output_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return sum(p['duration'] for p in probes)
+
+def merge_reencode(video_paths, output_path):
+    """Decode every track and re-encode the whole album with moviepy"""
+    from moviepy import VideoFileClip, concatenate_videoclips
+    clips = [VideoFileClip(path) for path in video_paths]
+    final_video = concatenate_videoclips(clips, method="compose")
+
+    final_video.write_videofile(
+        output_path,
+        fps=24,
+        codec='libx264',
+        audio_codec='aac',
+        logger=None
+    )
+
+    total_duration = sum(c.duration for c in clips)
+
+    final_video.close()
+    for clip in clips:
+        clip.close()
+
+    return total_duration
+
+def merge_album_videos(progress_file='album_progress.json', output_dir='outputs', mode='copy'):
     with open(progress_file, 'r') as f:
         progress = json.load(f)
     
@@ -12,38 +148,38 @@ def merge_album_videos(progress_file='album_progress.json', output_dir='outputs'
     
     print(f"🎬 Merging {len(progress['completed_tracks'])} videos...")
     
-    clips = []
+    video_paths = []
     for track_info in sorted(progress['completed_tracks'], key=lambda x: int(x['position'])):
         video_path = track_info['video_path']
         
         if os.path.exists(video_path):
-            print(f"  ✓ Loading track {track_info['position']}: {track_info['title']}")
-            clip = VideoFileClip(video_path)
-            clips.append(clip)
+            print(f"  ✓ Found track {track_info['position']}: {track_info['title']}")
+            video_paths.append(video_path)
         else:
             print(f"  ✗ Missing: {video_path}")
     
-    if not clips:
+    if not video_paths:
         print("❌ No valid video files found")
         return
     
-    print(f"\n🔗 Concatenating {len(clips)} videos...")
-    final_video = concatenate_videoclips(clips, method="compose")
-    
     album_name = progress['album'].replace(' ', '_').replace('/', '-')
     artist_name = progress['artist'].replace(' ', '_').replace('/', '-')
     output_path = os.path.join(output_dir, f'{artist_name}_{album_name}_full_album.mp4')
     
-    print(f"💾 Rendering final album video...")
-    final_video.write_videofile(
-        output_path,
-        fps=24,
-        codec='libx264',
-        audio_codec='aac',
-        logger=None
-    )
+    total_duration = None
+    if mode == 'copy':
+        print(f"\n🔗 Concatenating {len(video_paths)} videos (stream copy)...")
+        try:
+            total_duration = merge_stream_copy(video_paths, output_path)
+        except (OSError, subprocess.CalledProcessError) as e:
+            stderr = getattr(e, 'stderr', '') or ''
+            print(f"⚠️  Stream copy failed ({e}) {stderr.strip()}")
+            print("   Falling back to full re-encode...")
     
-    total_duration = sum(c.duration for c in clips)
+    if total_duration is None:
+        print(f"\n🔗 Concatenating {len(video_paths)} videos (re-encode)...")
+        print("💾 Rendering final album video...")
+        total_duration = merge_reencode(video_paths, output_path)
     
     print("\n" + "="*60)
     print("✅ FULL ALBUM VIDEO CREATED!")
@@ -51,13 +187,20 @@ def merge_album_videos(progress_file='album_progress.json', output_dir='outputs'
     print(f"📁 Output: {output_path}")
     print(f"🎵 Album: {progress['album']}")
     print(f"🎤 Artist: {progress['artist']}")
-    print(f"📊 Tracks: {len(clips)}")
+    print(f"📊 Tracks: {len(video_paths)}")
     print(f"⏱️  Duration: {total_duration/60:.1f} minutes")
     print("="*60)
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge an album's track videos into one video")
+    # Batch runs keep one progress file per album; merge each one given
+    parser.add_argument('progress_files', nargs='*', default=['album_progress.json'])
+    parser.add_argument('--reencode', action='store_true',
+                        help="Decode and re-encode every track instead of stream-copying them")
+    args = parser.parse_args()
     
-    final_video.close()
-    for clip in clips:
-        clip.close()
+    for progress_file in args.progress_files:
+        merge_album_videos(progress_file, mode='reencode' if args.reencode else 'copy')
 
 if __name__ == "__main__":
-    merge_album_videos()
\ No newline at end of file
+    main()
@@ -0,0 +1,139 @@
+import os
+import json
+import threading
+
+PROGRESS_FILE = 'album_progress.json'
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file and rename it over path, so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class ProgressStore:
+    """
+    Album progress as a JSON snapshot plus an append-only event log.
+
+    Every change is an event appended (and fsynced) to
+    <name>.events.jsonl and applied to the in-memory state. Stage updates
+    only go to the log; track results and top-level fields also rewrite
+    the snapshot atomically (temp file + rename), which then becomes the
+    new base and empties the log. On load, events newer than the snapshot
+    are replayed, so a crash loses at most a half-written last log line.
+
+    The snapshot keeps the album_progress.json layout the workflows and
+    merge_videos.py read. Completed and failed tracks are also indexed by
+    track_id for O(1) lookups.
+    """
+
+    def __init__(self, path: str = PROGRESS_FILE, initial: dict = None, compact_every: int = 200):
+        self.path = path
+        self.events_path = os.path.splitext(path)[0] + '.events.jsonl'
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._pending = 0
+
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.state = json.load(f)
+        else:
+            self.state = dict(initial or {})
+        self.state.setdefault('completed_tracks', [])
+        self.state.setdefault('failed_tracks', [])
+        self.state.setdefault('stages', {})
+        self.state.setdefault('event_seq', 0)
+        self._reindex()
+
+        replayed = self._replay()
+        if replayed or not os.path.exists(path):
+            if replayed:
+                print(f"♻️  Recovered {replayed} progress event(s) from {self.events_path}")
+            self.compact()
+
+    def _reindex(self):
+        self.completed = {t['track_id']: t for t in self.state['completed_tracks']}
+        self.failed = {t['track_id']: t for t in self.state['failed_tracks']}
+
+    def _replay(self):
+        if not os.path.exists(self.events_path):
+            return 0
+
+        replayed = 0
+        with open(self.events_path, 'r') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break  # torn write from a crash; nothing after it was acknowledged
+                if event['seq'] <= self.state['event_seq']:
+                    continue
+                self._apply(event)
+                replayed += 1
+        return replayed
+
+    def _apply(self, event):
+        kind = event['type']
+        if kind == 'completed':
+            entry = event['entry']
+            if entry['track_id'] in self.failed:
+                del self.failed[entry['track_id']]
+                self.state['failed_tracks'] = list(self.failed.values())
+            if entry['track_id'] not in self.completed:
+                self.state['completed_tracks'].append(entry)
+            else:
+                self.state['completed_tracks'] = [
+                    entry if t['track_id'] == entry['track_id'] else t for t in self.state['completed_tracks']
+                ]
+            self.completed[entry['track_id']] = entry
+        elif kind == 'failed':
+            entry = event['entry']
+            if entry['track_id'] not in self.failed:
+                self.state['failed_tracks'].append(entry)
+            else:
+                self.state['failed_tracks'] = [
+                    entry if t['track_id'] == entry['track_id'] else t for t in self.state['failed_tracks']
+                ]
+            self.failed[entry['track_id']] = entry
+        elif kind == 'stage':
+            self.state['stages'].setdefault(event['track_id'], {})[event['stage']] = event['state']
+        elif kind == 'set':
+            self.state.update(event['fields'])
+        self.state['event_seq'] = event['seq']
+
+    def _record(self, kind, snapshot, **data):
+        with self._lock:
+            event = dict(data, type=kind, seq=self.state['event_seq'] + 1)
+            with open(self.events_path, 'a') as f:
+                f.write(json.dumps(event) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(event)
+            self._pending += 1
+            if snapshot or self._pending >= self.compact_every:
+                self.compact()
+
+    def compact(self):
+        """Write the snapshot atomically, then drop the events it now contains"""
+        with self._lock:
+            write_json_atomic(self.path, self.state)
+            if os.path.exists(self.events_path):
+                os.remove(self.events_path)
+            self._pending = 0
+
+    def is_done(self, track_id: str) -> bool:
+        return track_id in self.completed or track_id in self.failed
+
+    def mark_completed(self, entry: dict):
+        self._record('completed', True, entry=entry)
+
+    def mark_failed(self, entry: dict):
+        self._record('failed', True, entry=entry)
+
+    def set_stage(self, track_id: str, stage: str, state: str):
+        self._record('stage', False, track_id=track_id, stage=stage, state=state)
+
+    def update(self, **fields):
+        self._record('set', True, fields=fields)
@@ -0,0 +1,201 @@
+import os
+import time
+import threading
+from typing import Callable, Dict, Optional
+
+SONG_JOB_MAX_ACTIVE = int(os.getenv('SONG_JOB_MAX_ACTIVE', '4'))
+SONG_JOB_TIMEOUT = float(os.getenv('SONG_JOB_TIMEOUT', '900'))
+SONG_JOB_QUEUE_TIMEOUT = float(os.getenv('SONG_JOB_QUEUE_TIMEOUT', '7200'))
+SONG_JOB_RETRIES = int(os.getenv('SONG_JOB_RETRIES', '2'))
+SONG_JOB_BACKOFF = float(os.getenv('SONG_JOB_BACKOFF', '15'))
+SONG_JOB_POLL_SECONDS = float(os.getenv('SONG_JOB_POLL_SECONDS', '5'))
+
+# gradio_client Status codes once the Space has picked the job up
+RUNNING_STATUS_CODES = {'PROCESSING', 'ITERATING', 'PROGRESS', 'LOG'}
+
+def parse_song_result(result):
+    """(audio path, generation metadata) from a /generate_song result"""
+    if isinstance(result, (list, tuple)) and len(result) >= 2:
+        return result[0], result[1] if isinstance(result[1], dict) else {}
+    return (result if isinstance(result, str) else result[0]), {}
+
+def describe_status(status) -> str:
+    """One-line summary of a gradio_client StatusUpdate: stage, queue position, ETA"""
+    code = getattr(status, 'code', None)
+    text = getattr(code, 'name', str(code)).lower().replace('_', ' ')
+    rank, size, eta = getattr(status, 'rank', None), getattr(status, 'queue_size', None), getattr(status, 'eta', None)
+    if rank is not None:
+        text += f" {rank + 1}/{size}" if size else f" #{rank + 1}"
+    if eta:
+        text += f", eta {eta:.0f}s"
+    return text
+
+class SongJob:
+    def __init__(self, name: str, lyrics: str):
+        self.name = name
+        self.lyrics = lyrics
+        self.job = None
+        self.attempts = 0
+        self.submitted = 0.0
+        self.started = None
+        self.not_before = 0.0
+        self.last_status = None
+        self.error = None
+
+class SongJobManager:
+    """
+    Song generation on the Space through gradio_client's submit()/Job API.
+
+    run() submits every job, keeping at most max_active in the remote
+    queue at once (shared by all threads using this manager), polls them
+    every poll_seconds, prints queue position changes and hands each
+    result to on_done as soon as it finishes. A job that fails, runs past
+    `timeout` seconds once the Space starts processing it, or waits in
+    the Space's queue past `queue_timeout` seconds is cancelled and
+    resubmitted after an exponential backoff, up to `retries` times.
+
+    The client only needs submit(**kwargs) returning an object with
+    done(), result(), status() and cancel(), so a local fake can stand in
+    for the Space.
+    """
+
+    def __init__(self, client, submit_kwargs: dict = None, max_active: int = SONG_JOB_MAX_ACTIVE,
+                 timeout: float = SONG_JOB_TIMEOUT, queue_timeout: float = SONG_JOB_QUEUE_TIMEOUT, retries: int = SONG_JOB_RETRIES,
+                 backoff: float = SONG_JOB_BACKOFF, poll_seconds: float = SONG_JOB_POLL_SECONDS):
+        self.client = client
+        self.submit_kwargs = dict(submit_kwargs or {})
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.poll_seconds = poll_seconds
+        self._slots = threading.BoundedSemaphore(max(1, max_active))
+
+        self.submitted = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _start(self, job: SongJob, now: float) -> bool:
+        if not self._slots.acquire(blocking=False):
+            return False
+        job.attempts += 1
+        try:
+            job.job = self.client.submit(lyric=job.lyrics, **self.submit_kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        job.submitted = now
+        job.started = None
+        job.last_status = None
+        self.submitted += 1
+        print(f"📤 {job.name}: submitted (attempt {job.attempts})")
+        return True
+
+    def _finish(self, job: SongJob):
+        job.job = None
+        self._slots.release()
+
+    def _retry_or_fail(self, job: SongJob, error: Exception, now: float) -> bool:
+        """Schedule a resubmission; False once the job is out of retries"""
+        job.error = error
+        if job.attempts > self.retries:
+            self.failed += 1
+            print(f"❌ {job.name}: giving up after {job.attempts} attempt(s): {error}")
+            return False
+        delay = self.backoff * 2 ** (job.attempts - 1)
+        job.not_before = now + delay
+        self.retried += 1
+        print(f"🔁 {job.name}: {error}; retrying in {delay:.0f}s")
+        return True
+
+    def _poll(self, job: SongJob, now: float):
+        """'running', 'retry' or ('done', audio path) / ('failed', error) for an active job"""
+        if job.job.done():
+            handle = job.job
+            self._finish(job)
+            try:
+                audio_path, metadata = parse_song_result(handle.result())
+            except Exception as e:
+                return 'retry' if self._retry_or_fail(job, e, now) else ('failed', e)
+            if metadata and 'inference_duration' in metadata:
+                print(f"✓ {job.name}: generated in {metadata['inference_duration']:.1f}s")
+            return ('done', audio_path)
+
+        try:
+            update = job.job.status()
+            status = describe_status(update)
+        except Exception:
+            update, status = None, None
+        if status and status != job.last_status:
+            print(f"⏳ {job.name}: {status}")
+            job.last_status = status
+
+        # Time spent queued behind other users' jobs does not count against timeout
+        code = getattr(getattr(update, 'code', None), 'name', None)
+        if job.started is None and code in RUNNING_STATUS_CODES:
+            job.started = now
+
+        if job.started is not None and now - job.started > self.timeout:
+            error = TimeoutError(f"no result {self.timeout:.0f}s after processing started")
+        elif job.started is None and now - job.submitted > self.queue_timeout:
+            error = TimeoutError(f"still queued after {self.queue_timeout:.0f}s")
+        else:
+            return 'running'
+        job.job.cancel()
+        self._finish(job)
+        return 'retry' if self._retry_or_fail(job, error, now) else ('failed', error)
+
+    def run(self, lyrics_by_name: Dict[str, str], on_done: Optional[Callable] = None) -> Dict[str, object]:
+        """
+        Generate a song per entry; returns {name: audio path or exception}.
+        on_done(name, audio path) is called as each song finishes.
+        """
+        waiting = [SongJob(name, lyrics) for name, lyrics in lyrics_by_name.items()]
+        active = []
+        results = {}
+
+        try:
+            while waiting or active:
+                now = time.monotonic()
+                for job in [j for j in waiting if j.not_before <= now]:
+                    try:
+                        started = self._start(job, now)
+                    except Exception as e:
+                        if not self._retry_or_fail(job, e, now):
+                            waiting.remove(job)
+                            results[job.name] = e
+                        continue
+                    if not started:
+                        break
+                    waiting.remove(job)
+                    active.append(job)
+
+                for job in list(active):
+                    outcome = self._poll(job, now)
+                    if outcome == 'running':
+                        continue
+                    active.remove(job)
+                    if outcome == 'retry':
+                        waiting.append(job)
+                    elif outcome[0] == 'done':
+                        results[job.name] = outcome[1]
+                        if on_done is not None:
+                            on_done(job.name, outcome[1])
+                    else:
+                        results[job.name] = outcome[1]
+
+                if waiting or active:
+                    time.sleep(self.poll_seconds)
+        finally:
+            for job in active:
+                job.job.cancel()
+                self._finish(job)
+
+        return results
+
+    def generate(self, lyrics: str, name: str = 'song') -> str:
+        """Generate one song and return its audio path, raising its last error on failure"""
+        result = self.run({name: lyrics})[name]
+        if isinstance(result, Exception):
+            raise result
+        return result
@@ -0,0 +1,100 @@
+import queue
+import threading
+from typing import Callable, List, Optional
+
+_DONE = object()
+
+class Stage:
+    """One pipeline step: fn(item, payload) -> payload for the next stage, run by `workers` threads"""
+
+    def __init__(self, name: str, fn: Callable, workers: int = 1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+
+class StageScheduler:
+    """
+    Pipelined execution of items through a fixed list of stages.
+
+    Each stage has its own worker threads and a bounded input queue, so
+    item N+1 can be in an early stage while item N is in a later one, and
+    a slow stage holds back the stages feeding it (at most `queue_size`
+    items wait in front of any stage) instead of letting work pile up.
+    An item whose stage raises is dropped from the rest of the pipeline.
+
+    on_event(item, stage_name, state, info) is called from worker threads
+    with state 'running', 'done' (info = stage result) or 'failed'
+    (info = the exception). Exceptions raised by on_event are printed and
+    otherwise ignored.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 1, on_event: Optional[Callable] = None):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.on_event = on_event or (lambda item, stage, state, info: None)
+
+    def run(self, items: list) -> list:
+        """Push all items through; returns [(item, final payload or exception)] in input order"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        results = {}
+        results_lock = threading.Lock()
+
+        def notify(item, stage, state, info):
+            # A failing callback must not take the worker, and the pipeline, down with it
+            try:
+                self.on_event(item, stage.name, state, info)
+            except Exception as e:
+                print(f"⚠️  {stage.name}: on_event({state}) raised {type(e).__name__}: {e}")
+
+        def worker(stage_index, stage, remaining):
+            inbox = queues[stage_index]
+            outbox = queues[stage_index + 1] if stage_index + 1 < len(queues) else None
+            try:
+                while True:
+                    entry = inbox.get()
+                    if entry is _DONE:
+                        return
+
+                    position, item, payload = entry
+                    notify(item, stage, 'running', None)
+                    try:
+                        payload = stage.fn(item, payload)
+                    except Exception as e:
+                        notify(item, stage, 'failed', e)
+                        with results_lock:
+                            results[position] = (item, e)
+                        continue
+
+                    notify(item, stage, 'done', payload)
+                    if outbox is not None:
+                        outbox.put((position, item, payload))
+                    else:
+                        with results_lock:
+                            results[position] = (item, payload)
+            finally:
+                # The last worker out of a stage closes the next one, however it exits
+                with remaining['lock']:
+                    remaining['count'] -= 1
+                    last = remaining['count'] == 0
+                if last and outbox is not None:
+                    for _ in range(self.stages[stage_index + 1].workers):
+                        outbox.put(_DONE)
+
+        threads = []
+        for stage_index, stage in enumerate(self.stages):
+            remaining = {'count': stage.workers, 'lock': threading.Lock()}
+            for n in range(stage.workers):
+                thread = threading.Thread(target=worker, args=(stage_index, stage, remaining),
+                                          name=f"{stage.name}-{n}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        for position, item in enumerate(items):
+            queues[0].put((position, item, None))
+        for _ in range(self.stages[0].workers):
+            queues[0].put(_DONE)
+
+        for thread in threads:
+            thread.join()
+
+        return [results[position] for position in range(len(items))]
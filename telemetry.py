@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import threading
+import contextvars
+from contextlib import contextmanager
+
+TELEMETRY_ENV = 'PIPELINE_TELEMETRY'
+TELEMETRY_TAGS_ENV = 'PIPELINE_TELEMETRY_TAGS'
+TELEMETRY_PARENT_ENV = 'PIPELINE_TELEMETRY_PARENT'
+
+# (sink, tags, span name) of the innermost open span; a ContextVar so
+# threads and asyncio tasks each see their own
+_current = contextvars.ContextVar('telemetry_span', default=None)
+_env_sink = None
+_env_lock = threading.Lock()
+
+def telemetry_path(progress_file: str) -> str:
+    """JSON-lines telemetry file kept next to a progress file"""
+    return os.path.splitext(progress_file)[0] + '.telemetry.jsonl'
+
+def process_io():
+    """(read_bytes, write_bytes) of this process from /proc, or (None, None) where unavailable"""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            fields = dict(line.split(': ') for line in f.read().splitlines())
+        return int(fields['read_bytes']), int(fields['write_bytes'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class Telemetry:
+    """
+    Appends one JSON line per finished span to `path`.
+
+    A span records wall time, CPU time of the calling thread, CPU time of
+    child processes (the stage scripts, ffmpeg), current and peak RSS and
+    the bytes read/written from disk over its lifetime. RSS peak and I/O
+    are process-wide, so with pipelined stages they include the other
+    threads' work. Spans opened with the module-level span() inside a
+    Telemetry.span() are written to the same file, tagged with its tags
+    and with the enclosing span as 'parent'.
+    """
+
+    def __init__(self, path: str, **tags):
+        self.path = path
+        self.tags = tags
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def emit(self, event: dict):
+        line = json.dumps(event, default=str) + '\n'
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line)
+
+    def span(self, name: str, **tags):
+        return _span(self, dict(self.tags, **tags), name)
+
+    def env(self, **tags) -> dict:
+        """
+        Environment for a child process so its spans land in this file with
+        these tags, under the span open in the calling thread
+        """
+        current = _current.get()
+        env = {TELEMETRY_ENV: os.path.abspath(self.path),
+               TELEMETRY_TAGS_ENV: json.dumps(dict(self.tags, **tags), default=str)}
+        if current is not None:
+            env[TELEMETRY_PARENT_ENV] = current[2]
+        return env
+
+@contextmanager
+def _span(sink, tags, name, parent_name=None):
+    parent = _current.get()
+    if parent is not None:
+        parent_name = parent[2]
+    token = _current.set((sink, tags, name))
+    read_before, write_before = process_io()
+    children_before = children_cpu()
+    cpu_before = time.thread_time()
+    start = time.perf_counter()
+    event = {'ok': True}
+    try:
+        yield event
+    except BaseException as e:
+        event.update(ok=False, error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        wall = time.perf_counter() - start
+        cpu = time.thread_time() - cpu_before
+        read_after, write_after = process_io()
+        _current.reset(token)
+        record = dict(tags)
+        record.update({
+            'ts': time.time(),
+            'name': name,
+            'parent': parent_name,
+            'pid': os.getpid(),
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'children_cpu_s': round(children_cpu() - children_before, 6),
+            'rss_mb': current_rss_mb(),
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'read_bytes': read_after - read_before if read_after is not None else None,
+            'write_bytes': write_after - write_before if write_after is not None else None,
+        })
+        record.update(event)
+        sink.emit(record)
+
+def _sink_from_env():
+    global _env_sink
+    with _env_lock:
+        if _env_sink is None and os.getenv(TELEMETRY_ENV):
+            tags = json.loads(os.getenv(TELEMETRY_TAGS_ENV) or '{}')
+            _env_sink = Telemetry(os.environ[TELEMETRY_ENV], **tags)
+    return _env_sink
+
+@contextmanager
+def span(name: str, **tags):
+    """
+    Time a stage or sub-step into the enclosing span's Telemetry, or the
+    one named by $PIPELINE_TELEMETRY in a stage script; a no-op otherwise.
+    Yields a dict whose entries are added to the event.
+    """
+    current = _current.get()
+    if current is not None:
+        sink, inherited, parent_name = current[0], current[1], None
+    else:
+        sink = _sink_from_env()
+        inherited = sink.tags if sink is not None else {}
+        parent_name = os.getenv(TELEMETRY_PARENT_ENV)
+
+    if sink is None:
+        yield {}
+        return
+
+    with _span(sink, dict(inherited, **tags), name, parent_name) as event:
+        yield event
+
+def load_events(paths):
+    events = []
+    for path in paths:
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut short by a crash
+    return events
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+def summarize(events, by=('name',)):
+    """Per group: count, failures, wall total/mean/p50/p95, CPU, peak RSS and I/O totals"""
+    groups = {}
+    for event in events:
+        key = tuple(str(event.get(field, '-')) for field in by)
+        groups.setdefault(key, []).append(event)
+
+    rows = []
+    for key, group in sorted(groups.items()):
+        walls = [e['wall_s'] for e in group]
+        rows.append({
+            **dict(zip(by, key)),
+            'count': len(group),
+            'failed': sum(1 for e in group if not e.get('ok', True)),
+            'wall_total_s': sum(walls),
+            'wall_mean_s': sum(walls) / len(walls),
+            'wall_p50_s': percentile(walls, 0.5),
+            'wall_p95_s': percentile(walls, 0.95),
+            'cpu_total_s': sum(e.get('cpu_s', 0) + e.get('children_cpu_s', 0) for e in group),
+            'peak_rss_mb': max((e.get('peak_rss_mb') or 0) for e in group),
+            'read_mb': sum(e.get('read_bytes') or 0 for e in group) / (1024 * 1024),
+            'write_mb': sum(e.get('write_bytes') or 0 for e in group) / (1024 * 1024),
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize pipeline telemetry across tracks and albums")
+    parser.add_argument('command', choices=['summary'])
+    parser.add_argument('files', nargs='*', default=['album_progress.telemetry.jsonl'],
+                        help="Telemetry files (default: the single-album one)")
+    parser.add_argument('--by', default='name',
+                        help="Comma-separated fields to group by, e.g. name, album,name or track,name")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    files = [path for path in args.files if os.path.exists(path)]
+    if not files:
+        print("❌ No telemetry files found")
+        sys.exit(1)
+
+    by = tuple(field.strip() for field in args.by.split(','))
+    rows = summarize(load_events(files), by)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    label_width = max([len(' / '.join(str(row[f]) for f in by)) for row in rows] + [10])
+    print(f"{' / '.join(by):{label_width}s} {'n':>4s} {'fail':>4s} {'total':>9s} {'mean':>8s} "
+          f"{'p95':>8s} {'cpu':>9s} {'peak RSS':>9s} {'read':>8s} {'write':>8s}")
+    for row in rows:
+        label = ' / '.join(str(row[f]) for f in by)
+        print(f"{label:{label_width}s} {row['count']:4d} {row['failed']:4d} {row['wall_total_s']:8.1f}s "
+              f"{row['wall_mean_s']:7.2f}s {row['wall_p95_s']:7.2f}s {row['cpu_total_s']:8.1f}s "
+              f"{row['peak_rss_mb']:6.0f} MB {row['read_mb']:5.0f} MB {row['write_mb']:5.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Groq structuring against mocked clients: the raw-response path must parse
+the response (awaiting it on AsyncGroq) and book usage on the key.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import asyncio
+import unittest
+import warnings
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fetch_lyrics import LyricsModule
+
+LYRICS = "first line\nsecond line"
+STRUCTURED = "[verse]\nfirst line\nsecond line\n\n[outro-short]"
+
+def completion(content, total_tokens=120):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                           usage=SimpleNamespace(total_tokens=total_tokens))
+
+def raw_response(parse):
+    return SimpleNamespace(headers={'x-ratelimit-remaining-requests': '29'}, parse=parse)
+
+def groq_client(create):
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        with_raw_response=SimpleNamespace(create=create))))
+
+class StructureLyricsTest(unittest.TestCase):
+    def setUp(self):
+        self.module = LyricsModule(['key-a'])
+        self.key = self.module.pool.keys[0]
+
+    def test_async_awaits_raw_parse(self):
+        # AsyncGroq's with_raw_response returns an AsyncAPIResponse whose parse() is a coroutine
+        raw = raw_response(mock.AsyncMock(return_value=completion(STRUCTURED)))
+        create = mock.AsyncMock(return_value=raw)
+
+        async def run():
+            return await self.module._structure_lyrics_async(
+                [groq_client(create)], asyncio.Semaphore(1), LYRICS, 'Song', 'Artist')
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            structured = asyncio.run(run())
+
+        self.assertEqual(structured, self.module._format_structured(STRUCTURED))
+        create.assert_awaited_once()
+        raw.parse.assert_awaited_once()
+        self.assertEqual(self.key.tokens_used, 120)
+        self.assertFalse(self.key.disabled)
+
+    def test_async_exhausted_keys_return_none(self):
+        create = mock.AsyncMock(side_effect=RuntimeError("boom"))
+
+        async def run():
+            return await self.module._structure_lyrics_async(
+                [groq_client(create)], asyncio.Semaphore(1), LYRICS, 'Song', 'Artist')
+
+        self.assertIsNone(asyncio.run(run()))
+
+    def test_sync_parses_raw_response(self):
+        raw = raw_response(mock.Mock(return_value=completion(STRUCTURED)))
+        self.module.clients[self.key.index] = groq_client(mock.Mock(return_value=raw))
+
+        structured = self.module.structure_lyrics(LYRICS, 'Song', 'Artist')
+
+        self.assertEqual(structured, self.module._format_structured(STRUCTURED))
+        raw.parse.assert_called_once_with()
+        self.assertEqual(self.key.tokens_used, 120)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import json
+import shutil
+
+LYRICS_FILE = 'structured_lyrics.txt'
+METADATA_FILE = 'lyrics_metadata.json'
+WORKSPACES_DIR = 'workspaces'
+
+def song_filenames(title: str):
+    """(original, choir) FLAC names the song stage writes and the video stage reads"""
+    slug = title.replace(' ', '_').lower()
+    return f"{slug}_ai_cover.flac", f"{slug}_ai_cover_slowed.flac"
+
+class TrackWorkspace:
+    """
+    Directory holding one track's handoff files between stages: structured
+    lyrics, lyrics metadata, the generated FLACs and render temp files.
+    The default '.' is the working directory the standalone scripts have
+    always used; the album pipeline gives every track its own.
+    """
+
+    def __init__(self, root: str = '.'):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    @classmethod
+    def allocate(cls, name: str, base_dir: str = WORKSPACES_DIR):
+        """Fresh workspace base_dir/name, emptied if a previous run left one behind"""
+        root = os.path.join(base_dir, name)
+        shutil.rmtree(root, ignore_errors=True)
+        return cls(root)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    @property
+    def lyrics_path(self) -> str:
+        return self.path(LYRICS_FILE)
+
+    @property
+    def metadata_path(self) -> str:
+        return self.path(METADATA_FILE)
+
+    def choir_song_path(self, title: str) -> str:
+        return self.path(song_filenames(title)[1])
+
+    def load_metadata(self) -> dict:
+        """Lyrics metadata, falling back to SONG_TITLE/SONG_ARTIST or the defaults"""
+        if os.path.exists(self.metadata_path):
+            with open(self.metadata_path, 'r') as f:
+                metadata = json.load(f)
+        else:
+            metadata = {}
+        metadata.setdefault('title', os.getenv('SONG_TITLE', 'Hey Jude'))
+        metadata.setdefault('artist', os.getenv('SONG_ARTIST', 'The Beatles'))
+        metadata.setdefault('detected_choruses', [])
+        return metadata
+
+    def remove(self):
+        if self.root not in ('.', ''):
+            shutil.rmtree(self.root, ignore_errors=True)